@@ -1,74 +1,9 @@
 #!/bin/sh
 
-# Merge GFS files for GDAL
+# Merge GFS files for GDAL (see vfr4ogr/gfs.py for list of merged
+# layers, 'validate' and 'trim' commands)
 
-merge() {
-    rm -f $FILE
-    echo "<GMLFeatureClassList>" > $FILE
-
-    for f in "$@"; do
-        echo "$f..."
-        cat ${f}.gfs | tail -n +2 | head -n -1 >> $FILE
-    done
-    echo "</GMLFeatureClassList>" >> $FILE
-}
-
-merge_st() {
-    FILE="ruian_vf_st_v1.gfs"
-    merge "Staty" \
-        "RegionySoudrznosti" \
-        "Vusc" \
-        "Okresy" \
-        "Orp" \
-        "Pou" \
-        "Obce" \
-        "SpravniObvody" \
-        "Mop" \
-        "Momc" \
-        "CastiObci" \
-        "KatastralniUzemi" \
-        "Zsj"
-}
-
-merge_ob() {
-    FILE="ruian_vf_ob_v1.gfs"
-    merge "Obce" \
-        "SpravniObvody" \
-        "Mop" \
-        "Momc" \
-        "CastiObci" \
-        "KatastralniUzemi" \
-        "Zsj" \
-        "Ulice" \
-        "Parcely" \
-        "StavebniObjekty" \
-        "AdresniMista"
-}
-
-merge_all() {
-    FILE="ruian_vf_v1.gfs"
-    merge "Staty" \
-        "RegionySoudrznosti" \
-        "Vusc" \
-        "Okresy" \
-        "Orp" \
-        "Pou" \
-        "Obce" \
-        "SpravniObvody" \
-        "Mop" \
-        "Momc" \
-        "CastiObci" \
-        "KatastralniUzemi" \
-        "Zsj" \
-        "Ulice" \
-        "Parcely" \
-        "StavebniObjekty" \
-        "AdresniMista" \
-        "ZaniklePrvky"
-}
-
-merge_st
-merge_ob
-merge_all
+cd `dirname $0`/..
+python3 -m vfr4ogr.gfs merge
 
 exit 0
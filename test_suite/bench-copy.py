@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+
+###############################################################################
+#
+# VFR importer based on GDAL library
+#
+# Author: Martin Landa <landa.martin gmail.com>
+#
+# Licence: MIT/X
+#
+###############################################################################
+
+"""
+Benchmark of copy loop (vfr2ogr) for SQLite and GPKG outputs
+
+Prints features/s and allocations per copied feature (output features
+created by ogr.Feature() and peak of memory allocated by Python, memory
+allocated by GDAL itself is not traced).
+
+Usage: bench-copy.py [--repeat N] [VFR file]
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+
+SCRIPTPATH = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(SCRIPTPATH, '..'))
+
+try:
+    from osgeo import ogr
+except ImportError as e:
+    sys.exit('ERROR: Import of ogr from osgeo failed. %s' % e)
+
+import vfr2ogr
+
+# (format, file extension)
+FORMATS = (('SQLite', 'db'), ('GPKG', 'gpkg'))
+
+class FeatureCounter:
+    def __init__(self):
+        """Count output features created by ogr.Feature().
+        """
+        self.count = 0
+        self._init = ogr.Feature.__init__
+
+    def __enter__(self):
+        init = self._init
+        def counted_init(feature, *args, **kwargs):
+            self.count += 1
+            init(feature, *args, **kwargs)
+        ogr.Feature.__init__ = counted_init
+        return self
+
+    def __exit__(self, *args):
+        ogr.Feature.__init__ = self._init
+
+def count_features(dsn):
+    """Count features stored in output datasource.
+
+    @param dsn: datasource name
+
+    @return number of features
+    """
+    ds = ogr.Open(dsn)
+    nfeat = 0
+    for i in range(ds.GetLayerCount()):
+        layer = ds.GetLayer(i)
+        if not layer.GetName().startswith('vfr_'): # skip control tables
+            nfeat += layer.GetFeatureCount()
+    ds = None
+
+    return nfeat
+
+def run(vfr_file, fmt, ext, tmpdir):
+    """Convert VFR file once.
+
+    @return tuple (number of features, time, created features, peak of traced memory)
+    """
+    dsn = os.path.join(tmpdir, 'bench.%s' % ext)
+    if os.path.exists(dsn):
+        os.remove(dsn)
+    argv = ['--file', vfr_file, '--format', fmt, '--dsn', dsn, '--overwrite']
+
+    tracemalloc.start()
+    with FeatureCounter() as counter:
+        stime = time.time()
+        vfr2ogr.main(argv)
+        elapsed = time.time() - stime
+    unused, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return count_features(dsn), elapsed, counter.count, peak
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of copy loop "
+                                     "(features/s and allocations per feature)")
+    parser.add_argument("file", nargs='?',
+                        default=os.path.join(SCRIPTPATH, 'OB_UKSH.xml.gz'),
+                        help="VFR file (default: OB_UKSH.xml.gz)")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Number of runs per format (default: 3)")
+    options = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix='vfr-bench-')
+    try:
+        print("%-8s %10s %12s %14s %14s" % \
+              ("format", "features", "features/s", "ogr.Feature/f", "py bytes/f"))
+        for fmt, ext in FORMATS:
+            # best of N runs (first run warms up GDAL driver)
+            best = None
+            for unused in range(options.repeat):
+                result = run(options.file, fmt, ext, tmpdir)
+                if best is None or result[1] < best[1]:
+                    best = result
+            nfeat, elapsed, ncreated, peak = best
+            if nfeat < 1:
+                sys.exit("ERROR: no features written into %s" % fmt)
+            print("%-8s %10d %12.0f %14.3f %14.3f" % \
+                  (fmt, nfeat, nfeat / elapsed, float(ncreated) / nfeat,
+                   float(peak) / nfeat))
+    finally:
+        shutil.rmtree(tmpdir)
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
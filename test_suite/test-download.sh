@@ -0,0 +1,39 @@
+#!/bin/sh
+set -e
+
+SCRIPT=`realpath $0` # realpath is a separate package and doesn't need
+                     # to be installed
+if [ -z $SCRIPT ] ; then
+    SCRIPTPATH='.'
+else
+    SCRIPTPATH=`dirname $SCRIPT`
+fi
+
+DB=ruian_test
+PORT=8765
+export DATA_DIR=`mktemp -d`
+export LOG_FILE=${SCRIPT}.log
+export BASE_URL=http://localhost:$PORT/
+rm -f $LOG
+
+# local server publishing ST_UKSH one day after end of month (fallback)
+SRVDIR=`mktemp -d`
+mkdir $SRVDIR/soucasna
+DATE=`python3 -c "import datetime; d = datetime.date.today().replace(day=1); print(d.strftime('%Y%m%d'))"`
+gunzip -c $SCRIPTPATH/ST_ZKSH.xml.gz > $SRVDIR/soucasna/${DATE}_ST_UKSH.xml
+(cd $SRVDIR/soucasna && zip -q ${DATE}_ST_UKSH.xml.zip ${DATE}_ST_UKSH.xml && rm ${DATE}_ST_UKSH.xml)
+(cd $SRVDIR && python3 -m http.server $PORT > /dev/null 2>&1) &
+SRVPID=$!
+trap "kill $SRVPID; rm -rf $SRVDIR $DATA_DIR" EXIT
+sleep 1
+
+rm -f ${DB}.db
+
+echo "1st PASS (download with date fallback...)"
+$SCRIPTPATH/../vfr2ogr.py --type ST_UKSH --format SQLite --dsn ${DB}.db
+test -f $DATA_DIR/${DATE}_ST_UKSH.xml.zip
+
+echo "2nd PASS (already downloaded...)"
+$SCRIPTPATH/../vfr2ogr.py --type ST_UKSH --format SQLite --dsn ${DB}.db --overwrite
+
+exit 0
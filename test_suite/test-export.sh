@@ -0,0 +1,31 @@
+#!/bin/sh
+set -e
+
+SCRIPT=`realpath $0` # realpath is a separate package and doesn't need
+                     # to be installed
+if [ -z $SCRIPT ] ; then
+    SCRIPTPATH='.'
+else
+    SCRIPTPATH=`dirname $SCRIPT`
+fi
+
+DB=ruian_test
+export DATA_DIR=$SCRIPTPATH
+export LOG_FILE=${SCRIPT}.log
+rm -f $LOG
+
+psql -d $DB -f $SCRIPTPATH/cleandb.sql
+$SCRIPTPATH/../vfr2pg.py --file $SCRIPTPATH/OB_UKSH.xml.gz --dbname $DB
+
+rm -f ${DB}_export.gpkg
+
+echo "1st PASS (export...)"
+$SCRIPTPATH/../pg2ogr.py --dbname $DB --format GPKG --dsn ${DB}_export.gpkg
+
+echo "2nd PASS (already exists...)"
+$SCRIPTPATH/../pg2ogr.py --dbname $DB --format GPKG --dsn ${DB}_export.gpkg
+
+echo "3rd PASS (overwrite, parallel...)"
+$SCRIPTPATH/../pg2ogr.py --dbname $DB --format GPKG --dsn ${DB}_export.gpkg -o -g --jobs 4
+
+exit 0
@@ -0,0 +1,33 @@
+#!/bin/sh
+set -e
+
+SCRIPT=`realpath $0` # realpath is a separate package and doesn't need
+                     # to be installed
+if [ -z $SCRIPT ] ; then
+    SCRIPTPATH='.'
+else
+    SCRIPTPATH=`dirname $SCRIPT`
+fi
+
+cd $SCRIPTPATH/..
+OUTDIR=`mktemp -d`
+
+echo "1st PASS (merge...)"
+python3 -m vfr4ogr.gfs merge --output-dir $OUTDIR
+for f in ruian_vf_st_v1 ruian_vf_ob_v1 ruian_vf_v1; do
+    diff gfs/$f.gfs $OUTDIR/$f.gfs
+done
+
+echo "2nd PASS (validate...)"
+python3 -m vfr4ogr.gfs validate gfs/ruian_vf_v1.gfs \
+        $SCRIPTPATH/OB_UKSH.xml.gz $SCRIPTPATH/ST_ZKSH.xml.gz
+
+echo "3rd PASS (trim...)"
+python3 -m vfr4ogr.gfs trim gfs/ruian_vf_v1.gfs $OUTDIR/trim.gfs \
+        --layer Obce,Parcely --columns "Parcely:Kod,DefinicniBod"
+grep -q "<Name>Parcely</Name>" $OUTDIR/trim.gfs
+! grep -q "<Name>Ulice</Name>" $OUTDIR/trim.gfs
+
+rm -rf $OUTDIR
+
+exit 0
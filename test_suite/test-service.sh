@@ -0,0 +1,52 @@
+#!/bin/sh
+set -e
+
+SCRIPT=`realpath $0` # realpath is a separate package and doesn't need
+                     # to be installed
+if [ -z $SCRIPT ] ; then
+    SCRIPTPATH='.'
+else
+    SCRIPTPATH=`dirname $SCRIPT`
+fi
+
+DB=ruian_test
+export DATA_DIR=`mktemp -d`
+export LOG_FILE=${SCRIPT}.log
+export CATALOGUE_URL=$SCRIPTPATH/catalogue.txt # published days, no network access
+rm -f $LOG
+
+# prepare local daily changes (no download needed)
+for DATE in 20261001 20261002 20261003 ; do
+    gunzip -c $SCRIPTPATH/ST_ZKSH.xml.gz > $DATA_DIR/${DATE}_ST_ZKSH.xml
+    (cd $DATA_DIR && zip -q ${DATE}_ST_ZKSH.xml.zip ${DATE}_ST_ZKSH.xml && rm ${DATE}_ST_ZKSH.xml)
+done
+
+if test -z "$1" ; then
+    PGM=pg
+    OPT="--dbname $DB"
+
+    psql -d $DB -f $SCRIPTPATH/cleandb.sql
+else
+    PGM=ogr
+    OPT="--format SQLite --dsn ${DB}.db"
+
+    rm -f ${DB}.db
+fi
+
+echo "Using vfr2${PGM}..."
+
+echo "1st PASS (apply first day...)"
+$SCRIPTPATH/../vfr2${PGM}.py --type ST_ZKSH --service --date 20261001:20261001 $OPT
+
+echo "2nd PASS (apply remaining days in one pass...)"
+$SCRIPTPATH/../vfr2${PGM}.py --type ST_ZKSH --service --date 20261001:20261003 $OPT
+
+echo "3rd PASS (nothing to apply...)"
+$SCRIPTPATH/../vfr2${PGM}.py --type ST_ZKSH --service --date 20261001:20261003 $OPT
+
+echo "4th PASS (date interval mapped to published days...)"
+$SCRIPTPATH/../vfr2${PGM}.py --type ST_ZKSH --date 20261001:20261004 --download
+
+rm -rf $DATA_DIR
+
+exit 0
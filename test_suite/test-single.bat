@@ -34,7 +34,32 @@ call vfr2%PGM% --file OB_UKSH.xml.gz %OPT% --a
 echo "5th PASS (geom_name...)"
 call vfr2%PGM% --file OB_UKSH.xml.gz %OPT% --o --geom OriginalniHranice
 
+echo "6th PASS (spatial sort...)"
+call vfr2%PGM% --file OB_UKSH.xml.gz %OPT% --o --spatial-sort
+
+echo "7th PASS (filter by municipality and bbox...)"
+call vfr2%PGM% --file OB_UKSH.xml.gz %OPT% --o --obec 564729 --bbox=-750000,-1100000,-700000,-1000000
+
+echo "8th PASS (additional output...)"
+del "%DB%_output.gpkg"
+call vfr2%PGM% --file OB_UKSH.xml.gz %OPT% --o --output GPKG:%DB%_output.gpkg
+
+echo "9th PASS (commit in batches...)"
+call vfr2%PGM% --file OB_UKSH.xml.gz %OPT% --o --commit-every 100
+
+echo "10th PASS (simplify, precision...)"
+call vfr2%PGM% --file OB_UKSH.xml.gz %OPT% --o --simplify 0.5 --precision 2 --jobs 2
+
+echo "11th PASS (reprojection...)"
+call vfr2%PGM% --file OB_UKSH.xml.gz %OPT% --o --t-srs EPSG:4326 --precision 7
+
+echo "12th PASS (columns, filter by municipality...)"
+call vfr2%PGM% --file OB_UKSH.xml.gz %OPT% --o --obec 564729 --layer Obce,Parcely --columns "Parcely:Kod,DefinicniBod"
+
 if %PGM%==pg (
-   echo "6th PASS (schema per file...)"
+   echo "13th PASS (spatial sort, cluster...)"
+   call vfr2%PGM% --file OB_UKSH.xml.gz %OPT% --o --spatial-sort --cluster
+
+   echo "14th PASS (schema per file...)"
    call vfr2%PGM% --file OB_UKSH.xml.gz %OPT% -s
 )
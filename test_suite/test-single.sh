@@ -44,8 +44,43 @@ $SCRIPTPATH/../vfr2${PGM}.py --file $SCRIPTPATH/OB_UKSH.xml.gz $OPT --a
 echo "5th PASS (geom_name...)"
 $SCRIPTPATH/../vfr2${PGM}.py --file $SCRIPTPATH/OB_UKSH.xml.gz $OPT --o --geom OriginalniHranice
 
+echo "6th PASS (spatial sort...)"
+$SCRIPTPATH/../vfr2${PGM}.py --file $SCRIPTPATH/OB_UKSH.xml.gz $OPT --o --spatial-sort
+
+echo "7th PASS (filter by municipality and bbox...)"
+$SCRIPTPATH/../vfr2${PGM}.py --file $SCRIPTPATH/OB_UKSH.xml.gz $OPT --o --obec 564729 --bbox=-750000,-1100000,-700000,-1000000
+
+echo "8th PASS (additional output...)"
+rm -f ${DB}_output.gpkg
+$SCRIPTPATH/../vfr2${PGM}.py --file $SCRIPTPATH/OB_UKSH.xml.gz $OPT --o --output GPKG:${DB}_output.gpkg
+
+echo "9th PASS (commit in batches...)"
+$SCRIPTPATH/../vfr2${PGM}.py --file $SCRIPTPATH/OB_UKSH.xml.gz $OPT --o --commit-every 100
+
+echo "10th PASS (simplify, precision...)"
+$SCRIPTPATH/../vfr2${PGM}.py --file $SCRIPTPATH/OB_UKSH.xml.gz $OPT --o --simplify 0.5 --precision 2 --jobs 2
+
+echo "11th PASS (reprojection...)"
+$SCRIPTPATH/../vfr2${PGM}.py --file $SCRIPTPATH/OB_UKSH.xml.gz $OPT --o --t-srs EPSG:4326 --precision 7
+
+echo "12th PASS (columns, filter by municipality...)"
+$SCRIPTPATH/../vfr2${PGM}.py --file $SCRIPTPATH/OB_UKSH.xml.gz $OPT --o --obec 564729 \
+    --layer Obce,Parcely --columns "Parcely:Kod,DefinicniBod"
 if [ "$PGM" = "pg" ] ; then
-    echo "6th PASS (schema per file...)"
+    NFEAT=`psql -d $DB -tAc "SELECT COUNT(*) FROM parcely"`
+else
+    NFEAT=`ogrinfo -ro -so ${DB}.db parcely | sed -n 's/^Feature Count: //p'`
+fi
+if [ "$NFEAT" -lt 1 ] ; then
+    echo "ERROR: no features imported"
+    exit 1
+fi
+
+if [ "$PGM" = "pg" ] ; then
+    echo "13th PASS (spatial sort, cluster...)"
+    $SCRIPTPATH/../vfr2${PGM}.py --file $SCRIPTPATH/OB_UKSH.xml.gz $OPT --o --spatial-sort --cluster
+
+    echo "14th PASS (schema per file...)"
     $SCRIPTPATH/../vfr2${PGM}.py --file $SCRIPTPATH/OB_UKSH.xml.gz $OPT -s
 fi
 
@@ -0,0 +1,37 @@
+#!/bin/sh
+set -e
+
+SCRIPT=`realpath $0` # realpath is a separate package and doesn't need
+                     # to be installed
+if [ -z $SCRIPT ] ; then
+    SCRIPTPATH='.'
+else
+    SCRIPTPATH=`dirname $SCRIPT`
+fi
+
+OUT=`mktemp`
+trap "rm -f $OUT" EXIT
+
+# print modules with highest cumulative import time (in us)
+importtime() {
+    python3 -X importtime "$@" 2> $OUT > /dev/null
+    sort -t'|' -k2 -n $OUT | tail -5
+}
+
+for PGM in vfr2ogr vfr2pg ; do
+    echo "${PGM} --help (no GDAL...)"
+    importtime $SCRIPTPATH/../${PGM}.py --help
+    if grep -q -e 'osgeo' -e 'vfr4ogr.vfrogr' -e 'http.client' $OUT ; then
+        echo "ERROR: ${PGM} --help loads GDAL or convertor"
+        exit 1
+    fi
+done
+
+echo "vfr2ogr --formats (no convertor...)"
+importtime $SCRIPTPATH/../vfr2ogr.py --formats
+if grep -q -e 'vfr4ogr.vfrogr' -e 'http.client' $OUT ; then
+    echo "ERROR: vfr2ogr --formats loads convertor"
+    exit 1
+fi
+
+exit 0
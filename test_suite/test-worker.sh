@@ -0,0 +1,32 @@
+#!/bin/sh
+set -e
+
+SCRIPT=`realpath $0` # realpath is a separate package and doesn't need
+                     # to be installed
+if [ -z $SCRIPT ] ; then
+    SCRIPTPATH='.'
+else
+    SCRIPTPATH=`dirname $SCRIPT`
+fi
+
+DB=ruian_test
+export DATA_DIR=$SCRIPTPATH
+export LOG_FILE=${SCRIPT}.log
+rm -f $LOG
+
+rm -f ${DB}.db
+
+echo "1st PASS (two jobs, one process...)"
+OUT=`mktemp`
+trap "rm -f $OUT" EXIT
+$SCRIPTPATH/../vfrworker.py > $OUT <<JOBS
+{"id": "1", "program": "vfr2ogr", "args": ["--file", "$SCRIPTPATH/OB_UKSH.xml.gz", "--format", "SQLite", "--dsn", "${DB}.db"]}
+{"id": "2", "program": "vfr2ogr", "args": ["--file", "$SCRIPTPATH/OB_UKSH.xml.gz", "--format", "SQLite", "--dsn", "${DB}.db"]}
+{"id": "3", "program": "vfr2ogr", "args": ["--unknown"]}
+JOBS
+cat $OUT
+test `grep -c '"event": "done"' $OUT` -eq 2
+test `grep -c '"cached": 1' $OUT` -eq 2
+grep -q '"id": "3", "event": "error"' $OUT
+
+exit 0
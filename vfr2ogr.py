@@ -15,12 +15,12 @@ import sys
 import atexit
 import argparse
 
-from vfr4ogr import VfrOgr
 from vfr4ogr.parse import parse_cmd
+from vfr4ogr.utils import list_formats
 from vfr4ogr.logger import check_log, VfrLogger
 from vfr4ogr.exception import VfrError, VfrErrorCmd
 
-def parse_args():
+def parse_args(argv=None):
     parser = argparse.ArgumentParser(prog="vfr2ogr",
                                      description="Converts VFR file into desired GIS format supported by OGR library."
                                      "Requires GDAL library version 1.11 or later.")
@@ -48,6 +48,14 @@ def parse_args():
                         help="Type of request in format XY_ABCD, eg. 'ST_UKSH' or 'OB_000000_ABCD'")
     parser.add_argument("--layer",
                         help="Import only selected layers separated by comma (if not given all layers are processed)")
+    parser.add_argument("--columns",
+                        help="Import only selected columns (attributes and geometries) given as 'Layer:col1,col2;Layer2:col1' or file with 'Layer=col1,col2' lines")
+    parser.add_argument("--bbox",
+                        help="Import only features in bounding box '--bbox=xmin,ymin,xmax,ymax' (S-JTSK)")
+    parser.add_argument("--clip-geom",
+                        help="Import only features intersecting geometry given as WKT or OGR datasource")
+    parser.add_argument("--obec",
+                        help="Import only features of municipalities given by codes separated by comma")
     parser.add_argument("--geom",
                         help="Preferred geometry 'OriginalniHranice' or 'GeneralizovaneHranice' (if not found or not given than first geometry is used)")
     parser.add_argument("--format",
@@ -60,34 +68,88 @@ def parse_args():
     parser.add_argument("-a", "--append",
                         action='store_true',
                         help="Append to existing PostGIS tables")
+    parser.add_argument("--spatial-sort",
+                        action='store_true',
+                        help="Write features sorted by Hilbert curve (improves spatial locality)")
+    parser.add_argument("--hash",
+                        action='store_true',
+                        help="Store content hash of features, unchanged features are skipped when applying changes")
+    parser.add_argument("--max-memory",
+                        type=int,
+                        help="Memory budget in MB for lists of changes, changes exceeding budget are moved to disk")
+    parser.add_argument("--jobs",
+                        type=int, default=1,
+                        help="Number of parallel jobs (default: 1)")
+    parser.add_argument("--commit-every",
+                        type=int,
+                        help="Number of features per transaction, interrupted import can be resumed by --append (default: 100000 for PostgreSQL, SQLite and GPKG, 0 for one transaction per layer)")
+    parser.add_argument("--simplify",
+                        type=float,
+                        help="Simplify geometries with given tolerance in meters (topology is preserved)")
+    parser.add_argument("--precision",
+                        type=int,
+                        help="Round coordinates to given number of decimal places")
+    parser.add_argument("--t-srs",
+                        help="Reproject geometries to given SRS (eg. EPSG:4326, default: S-JTSK EPSG:5514)")
+    parser.add_argument("--report",
+                        help="Write extended layer statistics (-e) into JSON file")
+    parser.add_argument("--output",
+                        action='append',
+                        help="Additional output datasource given as 'FORMAT:DSN' written from the same read pass (can be repeated)")
+    parser.add_argument("--service",
+                        action='store_true',
+                        help="Apply daily changes not applied yet (--type ST_ZXXX required, --date defines first day or date interval) in one pass")
+    parser.add_argument("--interval",
+                        type=int, default=0,
+                        help="Period in seconds to repeat --service (0 to run only once)")
 
-    return parser.parse_args(), parser.print_help
+    return parser.parse_args(argv), parser.print_help
+
+def convertor_options(options):
+    """Get convertor class and its options.
+
+    @param options: parsed options (see parse_cmd())
+
+    @return tuple (class, dictionary of keyword arguments)
+    """
+    from vfr4ogr import VfrOgr
 
-def main():
-    # parse cmdline arguments
-    options, usage = parse_args()
-    try:
-        file_list = parse_cmd(options)
-    except VfrErrorCmd as e:
-        usage()
-        sys.exit('ERROR: {}'.format(e))
-   
     # set up driver-specific options
     lco_options = []
-    if options.format == 'SQLite':
+    if options.format == 'SQLite' or \
+       any(o['format'] == 'SQLite' for o in options.output):
         os.environ['OGR_SQLITE_SYNCHRONOUS'] = 'OFF'
-    elif options.format == 'ESRI Shapefile':
+    if options.format == 'ESRI Shapefile':
         lco_options.append('ENCODING=UTF-8')
 
-    # create convertor
-    ogr = VfrOgr(frmt=options.format, dsn=options.dsn,
-                 geom_name=options.geom.split(',') if options.geom else None, layers=options.layer,
-                 nogeomskip=options.nogeomskip, overwrite=options.overwrite,
-                 lco_options=lco_options)
+    return VfrOgr, dict(frmt=options.format, dsn=options.dsn,
+                        geom_name=options.geom.split(',') if options.geom else None, layers=options.layer,
+                        nogeomskip=options.nogeomskip, overwrite=options.overwrite,
+                        lco_options=lco_options, spatial_sort=options.spatial_sort,
+                        content_hash=options.hash, bbox=options.bbox,
+                        clip_geom=options.clip_geom, obec=options.obec,
+                        columns=options.columns, max_memory=options.max_memory,
+                        jobs=options.jobs, report=options.report,
+                        outputs=options.output, commit_every=options.commit_every,
+                        simplify=options.simplify, precision=options.precision,
+                        t_srs=options.t_srs)
+
+def process(ogr, options, file_list):
+    """Process VFR files (see also vfrworker).
+
+    Raise VfrError on error.
+
+    @param ogr: convertor (VfrOgr instance)
+    @param options: parsed options (see parse_cmd())
+    @param file_list: list of VFR files
+
+    @return number of passes
+    """
+    if options.service:
+        # apply changes (periodically if requested) and exit
+        ogr.run_service(options.type, options.date, options.interval)
+        return 0
 
-    # write log process header
-    ogr.cmd_log(sys.argv)
-    
     if options.list:
         # list output datasource and exit
         ogr.print_summary()
@@ -100,12 +162,43 @@ def main():
         return 0
     
     # import VFR files
-    ipass = ogr.run()
+    ipass = ogr.run(options.append, options.extended)
+
+    # write extended statistics if requested
+    ogr.write_report()
 
     # print final summary
     if ipass > 1 or options.append:
         ogr.print_summary()
     
+    return ipass
+
+def main(argv=None):
+    # parse cmdline arguments
+    options, usage = parse_args(argv)
+    if options.formats:
+        # list supported formats and exit
+        list_formats()
+        return 0
+
+    try:
+        file_list = parse_cmd(options)
+    except VfrErrorCmd as e:
+        usage()
+        sys.exit('ERROR: {}'.format(e))
+   
+    # create convertor
+    cls, kwargs = convertor_options(options)
+    ogr = cls(**kwargs)
+
+    # write log process header
+    ogr.cmd_log(sys.argv)
+    
+    try:
+        process(ogr, options, file_list)
+    except VfrError as e:
+        sys.exit('ERROR: {}'.format(e))
+    
     return 0
 
 if __name__ == "__main__":
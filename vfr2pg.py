@@ -20,12 +20,11 @@ import sys
 import atexit
 import argparse
 
-from vfr4ogr import VfrPg
 from vfr4ogr.parse import parse_cmd
 from vfr4ogr.logger import check_log, VfrLogger
 from vfr4ogr.exception import VfrError, VfrErrorCmd
 
-def parse_args():
+def parse_args(argv=None):
     parser = argparse.ArgumentParser(prog="vfr2pg",
                                      description="Imports VFR data to PostGIS database. "
                                      "Requires GDAL library version 1.11 or later.")
@@ -53,6 +52,14 @@ def parse_args():
                         help="Type of request in format XY_ABCD, eg. 'ST_UKSH' or 'OB_000000_ABCD'")
     parser.add_argument("--layer",
                         help="Import only selected layers separated by comma (if not given all layers are processed)")
+    parser.add_argument("--columns",
+                        help="Import only selected columns (attributes and geometries) given as 'Layer:col1,col2;Layer2:col1' or file with 'Layer=col1,col2' lines")
+    parser.add_argument("--bbox",
+                        help="Import only features in bounding box '--bbox=xmin,ymin,xmax,ymax' (S-JTSK)")
+    parser.add_argument("--clip-geom",
+                        help="Import only features intersecting geometry given as WKT or OGR datasource")
+    parser.add_argument("--obec",
+                        help="Import only features of municipalities given by codes separated by comma")
     parser.add_argument("--geom",
                         help="Preferred geometry 'OriginalniHranice' or 'GeneralizovaneHranice' (if not found or not given than first geometry is used)")
     parser.add_argument("--dbname",
@@ -70,22 +77,66 @@ def parse_args():
     parser.add_argument("-o", "--overwrite",
                         action='store_true',
                         help="Overwrite existing PostGIS tables")
+    parser.add_argument("--index-concurrently",
+                        action='store_true',
+                        help="Create indices concurrently (without locking tables for writes)")
+    parser.add_argument("--gist",
+                        help="Geometry columns separated by comma to be spatially indexed first after import (in parallel, see --jobs), other geometry columns are indexed after them")
+    parser.add_argument("--estimate-count",
+                        action='store_true',
+                        help="Use planner estimates as number of features in summary (fast)")
     parser.add_argument("-a", "--append",
                         action='store_true',
                         help="Append to existing PostGIS tables")
+    parser.add_argument("--spatial-sort",
+                        action='store_true',
+                        help="Write features sorted by Hilbert curve (improves spatial locality)")
+    parser.add_argument("--hash",
+                        action='store_true',
+                        help="Store content hash of features, unchanged features are skipped when applying changes")
+    parser.add_argument("--max-memory",
+                        type=int,
+                        help="Memory budget in MB for lists of changes, changes exceeding budget are moved to disk")
+    parser.add_argument("--jobs",
+                        type=int, default=1,
+                        help="Number of parallel jobs (default: 1)")
+    parser.add_argument("--commit-every",
+                        type=int,
+                        help="Number of features per transaction, interrupted import can be resumed by --append (default: 100000, 0 for one transaction per layer)")
+    parser.add_argument("--simplify",
+                        type=float,
+                        help="Simplify geometries with given tolerance in meters (topology is preserved)")
+    parser.add_argument("--precision",
+                        type=int,
+                        help="Round coordinates to given number of decimal places")
+    parser.add_argument("--t-srs",
+                        help="Reproject geometries to given SRS (eg. EPSG:4326, default: S-JTSK EPSG:5514)")
+    parser.add_argument("--report",
+                        help="Write extended layer statistics (-e) into JSON file")
+    parser.add_argument("--output",
+                        action='append',
+                        help="Additional output datasource given as 'FORMAT:DSN' written from the same read pass (can be repeated)")
+    parser.add_argument("--service",
+                        action='store_true',
+                        help="Apply daily changes not applied yet (--type ST_ZXXX required, --date defines first day or date interval) in one pass")
+    parser.add_argument("--interval",
+                        type=int, default=0,
+                        help="Period in seconds to repeat --service (0 to run only once)")
+    parser.add_argument("--cluster",
+                        action='store_true',
+                        help="Cluster output tables on spatial index after import")
 
-    return parser.parse_args(), parser.print_help
+    return parser.parse_args(argv), parser.print_help
+
+def convertor_options(options):
+    """Get convertor class and its options.
+
+    @param options: parsed options (see parse_cmd())
+
+    @return tuple (class, dictionary of keyword arguments)
+    """
+    from vfr4ogr import VfrPg
 
-def main():
-    # parse cmdline arguments
-    options, usage = parse_args()
-    options.format = 'PostgreSQL'
-    try:
-        file_list = parse_cmd(options)
-    except VfrErrorCmd as e:
-        usage()
-        sys.exit('ERROR: {}'.format(e))
-        
     # build datasource name
     odsn = None
     if options.dbname:
@@ -99,17 +150,37 @@ def main():
         if options.port:
             odsn += " port=%s" % options.port
 
-    # create convertor
-    try:
-        pg = VfrPg(schema=options.schema, schema_per_file=options.fileschema,
-                   dsn=odsn, geom_name=options.geom, layers=options.layer,
-                   nogeomskip=options.nogeomskip, overwrite=options.overwrite)
-    except VfrError as e:
-        sys.exit('ERROR: {}'.format(e))
-    
-    # write log process header
-    pg.cmd_log(sys.argv)
-    
+    return VfrPg, dict(schema=options.schema, schema_per_file=options.fileschema,
+                       estimate_count=options.estimate_count,
+                       index_concurrently=options.index_concurrently,
+                       gist_columns=options.gist.split(',') if options.gist else [],
+                       dsn=odsn, geom_name=options.geom, layers=options.layer,
+                       nogeomskip=options.nogeomskip, overwrite=options.overwrite,
+                       spatial_sort=options.spatial_sort,
+                       content_hash=options.hash, bbox=options.bbox,
+                       clip_geom=options.clip_geom, obec=options.obec,
+                       columns=options.columns, max_memory=options.max_memory,
+                       jobs=options.jobs, report=options.report,
+                       outputs=options.output, commit_every=options.commit_every,
+                       simplify=options.simplify, precision=options.precision,
+                       t_srs=options.t_srs)
+
+def process(pg, options, file_list):
+    """Process VFR files (see also vfrworker).
+
+    Raise VfrError on error.
+
+    @param pg: convertor (VfrPg instance)
+    @param options: parsed options (see parse_cmd())
+    @param file_list: list of VFR files
+
+    @return number of passes
+    """
+    if options.service:
+        # apply changes (periodically if requested) and exit
+        pg.run_service(options.type, options.date, options.interval)
+        return 0
+
     if options.list:
         # list output database and exit
         pg.print_summary()
@@ -126,15 +197,49 @@ def main():
     
     # import input VFR files to PostGIS
     ipass = pg.run(options.append, options.extended)
+
+    # write extended statistics if requested
+    pg.write_report()
     
     # create indices for output tables
     pg.create_indices()
+
+    # cluster output tables on spatial index
+    if options.cluster:
+        pg.cluster_tables()
     
     # print final summary
     if (ipass > 1 and options.fileschema is False) \
             or options.append:
         pg.print_summary()
     
+    return ipass
+
+def main(argv=None):
+    # parse cmdline arguments
+    options, usage = parse_args(argv)
+    options.format = 'PostgreSQL'
+    try:
+        file_list = parse_cmd(options)
+    except VfrErrorCmd as e:
+        usage()
+        sys.exit('ERROR: {}'.format(e))
+        
+    # create convertor
+    try:
+        cls, kwargs = convertor_options(options)
+        pg = cls(**kwargs)
+    except VfrError as e:
+        sys.exit('ERROR: {}'.format(e))
+    
+    # write log process header
+    pg.cmd_log(sys.argv)
+    
+    try:
+        process(pg, options, file_list)
+    except VfrError as e:
+        sys.exit('ERROR: {}'.format(e))
+    
     return 0
 
 if __name__ == "__main__":
@@ -8,5 +8,17 @@
 #
 ###############################################################################
 
-from .vfrogr import VfrOgr
-from .vfrpg import VfrPg
+# convertors are imported on first access, GDAL library is not loaded
+# until needed (eg. vfr2ogr --help)
+_CONVERTORS = { 'VfrOgr' : '.vfrogr',
+                'VfrPg' : '.vfrpg',
+                'PgOgr' : '.pgogr' }
+
+__all__ = list(_CONVERTORS.keys())
+
+def __getattr__(name):
+    if name not in _CONVERTORS:
+        raise AttributeError("module '%s' has no attribute '%s'" % (__name__, name))
+
+    import importlib
+    return getattr(importlib.import_module(_CONVERTORS[name], __name__), name)
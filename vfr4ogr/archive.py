@@ -0,0 +1,346 @@
+###############################################################################
+#
+# VFR importer based on GDAL library
+#
+# Author: Martin Landa <landa.martin gmail.com>
+#
+# Licence: MIT/X
+#
+###############################################################################
+
+import os
+import re
+import json
+import time
+import shutil
+import hashlib
+import datetime
+import threading
+try:
+    import fcntl
+except ImportError:
+    # MS Windows
+    fcntl = None
+    import msvcrt
+
+from .logger import VfrLogger
+
+# name of index file in archive directory
+INDEX_FILE = 'index.json'
+
+# directory with stored objects (files named by content hash)
+OBJECTS_DIR = 'objects'
+
+# pattern of VFR file names (date, type)
+NAME_PATTERN = re.compile(r'^(\d{8})_(.+?)\.xml\.(zip|gz)$')
+
+# lock file guarding updates of index (more processes)
+LOCK_FILE = 'index.lock'
+
+class ArchiveLock:
+    def __init__(self, path):
+        """Reentrant lock of archive directory shared by threads
+        (archive instances of the same directory) and processes (lock
+        file).
+
+        @param path: archive directory
+        """
+        self._lock = threading.RLock()
+        self._lock_file = os.path.join(path, LOCK_FILE)
+        self._depth = 0
+        self._fd = None
+
+    def __enter__(self):
+        self._lock.acquire()
+        self._depth += 1
+        if self._depth == 1:
+            try:
+                self._fd = open(self._lock_file, 'a+')
+                if fcntl:
+                    fcntl.flock(self._fd, fcntl.LOCK_EX)
+                else:
+                    self._fd.seek(0)
+                    msvcrt.locking(self._fd.fileno(), msvcrt.LK_LOCK, 1)
+            except:
+                self.__exit__()
+                raise
+        return self
+
+    def __exit__(self, *args):
+        self._depth -= 1
+        if self._depth == 0 and self._fd:
+            if not fcntl:
+                self._fd.seek(0)
+                msvcrt.locking(self._fd.fileno(), msvcrt.LK_UNLCK, 1)
+            # lock is released by closing file
+            self._fd.close()
+            self._fd = None
+        self._lock.release()
+
+# locks shared by archive instances of the same directory
+_locks = {}
+_locks_lock = threading.Lock()
+
+def _get_lock(path):
+    """Get lock of archive directory.
+
+    @param path: archive directory
+
+    @return ArchiveLock instance
+    """
+    key = os.path.realpath(path)
+    with _locks_lock:
+        if key not in _locks:
+            _locks[key] = ArchiveLock(path)
+        return _locks[key]
+
+def file_hash(filename):
+    """Compute content hash of file.
+
+    @param filename: file name
+
+    @return SHA-256 hash as hex string
+    """
+    sha = hashlib.sha256()
+    with open(filename, 'rb') as fd:
+        for chunk in iter(lambda: fd.read(1024 * 1024), b''):
+            sha.update(chunk)
+
+    return sha.hexdigest()
+
+class Archive:
+    def __init__(self, path, max_age=None, max_count=None, max_size=None):
+        """Local store of downloaded VFR files.
+
+        Files are stored once by content hash (objects/<hash>), VFR
+        file names (YYYYMMDD_<type>.xml.zip) in archive directory are
+        hard links to stored objects, so identical files published
+        under more dates take space only once. Index file (index.json)
+        keeps hash, size, date and type of each file together with time
+        of last use, which is used for eviction (least recently used
+        files are removed first).
+
+        More instances (eg. convertors cached by vfrworker) can share
+        the same directory, index is re-read before each update.
+
+        @param path: archive directory (see DATA_DIR)
+        @param max_age: max age of files in days (by date of file, None for unlimited)
+        @param max_count: max number of files (None for unlimited)
+        @param max_size: max size of stored objects in MB (None for unlimited)
+        """
+        self._path = path
+        self._max_age = max_age
+        self._max_count = max_count
+        self._max_size = max_size
+        self._lock = _get_lock(self._path)
+        self._index_file = os.path.join(self._path, INDEX_FILE)
+        with self._lock:
+            self._index = self._read_index()
+
+    def _read_index(self):
+        """Read index file.
+
+        @return dictionary (file name -> item)
+        """
+        if not os.path.exists(self._index_file):
+            return {}
+        try:
+            with open(self._index_file) as fd:
+                return json.load(fd).get('files', {})
+        except ValueError as e:
+            VfrLogger.warning("Invalid archive index '%s' (%s), creating new one" % \
+                              (self._index_file, e))
+            return {}
+
+    def _write_index(self):
+        """Write index file (atomically).
+        """
+        tmp_file = self._index_file + '.tmp'
+        with open(tmp_file, 'w') as fd:
+            json.dump({ 'files' : self._index }, fd, indent=2, sort_keys=True)
+        os.replace(tmp_file, self._index_file)
+
+    def _object_path(self, sha):
+        return os.path.join(self._path, OBJECTS_DIR, sha[:2], sha)
+
+    def _link(self, source, target):
+        """Link stored object to VFR file name (copy if links are not
+        supported).
+        """
+        if os.path.exists(target):
+            os.remove(target)
+        try:
+            os.link(source, target)
+        except (OSError, AttributeError):
+            shutil.copy2(source, target)
+
+    def add(self, filename):
+        """Add file into archive.
+
+        If file with same content is already stored, the file is
+        replaced by link to stored object.
+
+        @param filename: path to file in archive directory
+
+        @return path to file
+        """
+        name = os.path.basename(filename)
+        sha = file_hash(filename)
+        size = os.path.getsize(filename)
+        with self._lock:
+            self._index = self._read_index()
+            obj = self._object_path(sha)
+            if os.path.exists(obj):
+                VfrLogger.debug("Archive: {} already stored as {}".format(name, sha))
+                if not os.path.samefile(obj, filename):
+                    self._link(obj, filename)
+            else:
+                if not os.path.exists(os.path.dirname(obj)):
+                    os.makedirs(os.path.dirname(obj))
+                self._link(filename, obj)
+
+            match = NAME_PATTERN.match(name)
+            now = time.time()
+            self._index[name] = { 'hash' : sha,
+                                  'size' : size,
+                                  'mtime' : os.path.getmtime(filename),
+                                  'date' : match.group(1) if match else None,
+                                  'type' : match.group(2) if match else None,
+                                  'added' : now,
+                                  'used' : now }
+            self._write_index()
+
+        return filename
+
+    def get(self, name, verify=True):
+        """Get file from archive.
+
+        Integrity of file is checked (size, content hash is computed
+        only when modification time differs from index), damaged file
+        is removed. File found in archive directory which is not
+        indexed yet is added into archive.
+
+        @param name: file name (or path)
+        @param verify: False to check only size of file
+
+        @return path to file or None if not available
+        """
+        name = os.path.basename(name)
+        filename = os.path.join(self._path, name)
+        with self._lock:
+            self._index = self._read_index()
+            item = self._index.get(name)
+        if item is None:
+            if os.path.isfile(filename):
+                return self.add(filename)
+            return None
+
+        # content hash is computed outside of lock (parallel downloads)
+        ok = os.path.isfile(filename) and os.path.getsize(filename) == item['size']
+        mtime = os.path.getmtime(filename) if ok else None
+        if ok and verify and item.get('mtime') != mtime:
+            ok = file_hash(filename) == item['hash']
+        with self._lock:
+            self._index = self._read_index()
+            if not ok:
+                VfrLogger.warning("Archive: file '%s' is damaged, removing" % name)
+                self._remove(name)
+                self._write_index()
+                return None
+
+            if name in self._index:
+                self._index[name]['used'] = time.time()
+                self._index[name]['mtime'] = mtime # verified
+                self._write_index()
+
+        return filename
+
+    def find(self, ftype=None, date=None):
+        """Find indexed files (no integrity check).
+
+        @param ftype: file type (eg. ST_UKSH, None for all)
+        @param date: date as string YYYYMMDD (None for all)
+
+        @return sorted list of file names
+        """
+        with self._lock:
+            self._index = self._read_index()
+            return sorted(name for name, item in self._index.items() \
+                          if (ftype is None or item['type'] == ftype) and \
+                          (date is None or item['date'] == date))
+
+    def dates(self, ftype=None):
+        """Get dates of indexed files.
+
+        @param ftype: file type (None for all types)
+
+        @return sorted list of dates (YYYYMMDD)
+        """
+        with self._lock:
+            self._index = self._read_index()
+            return sorted(set(item['date'] for item in self._index.values() \
+                              if item['date'] and (ftype is None or item['type'] == ftype)))
+
+    def _remove(self, name):
+        """Remove file from archive, stored object is removed when not
+        referenced by any other file.
+
+        @param name: file name
+        """
+        item = self._index.pop(name, None)
+        filename = os.path.join(self._path, name)
+        if os.path.exists(filename):
+            os.remove(filename)
+        if item and not any(i['hash'] == item['hash'] for i in self._index.values()):
+            obj = self._object_path(item['hash'])
+            if os.path.exists(obj):
+                os.remove(obj)
+            if not os.listdir(os.path.dirname(obj)):
+                os.rmdir(os.path.dirname(obj))
+
+    def _stored_size(self):
+        """Get size of stored objects in bytes.
+        """
+        sizes = {}
+        for item in self._index.values():
+            sizes[item['hash']] = item['size']
+        return sum(sizes.values())
+
+    def cleanup(self, keep=[]):
+        """Remove files exceeding retention limits.
+
+        Files older than max age are removed first, then least
+        recently used files until number and size of files fit limits.
+
+        @param keep: list of files which must not be removed
+
+        @return list of removed files
+        """
+        keep = set(os.path.basename(name) for name in keep)
+        removed = []
+        with self._lock:
+            self._index = self._read_index()
+            if self._max_age:
+                limit = (datetime.date.today() - \
+                         datetime.timedelta(days=self._max_age)).strftime("%Y%m%d")
+                for name, item in list(self._index.items()):
+                    if name not in keep and item['date'] and item['date'] < limit:
+                        self._remove(name)
+                        removed.append(name)
+
+            lru = sorted((item['used'], name) for name, item in self._index.items() \
+                         if name not in keep)
+            while lru and \
+                  ((self._max_count and len(self._index) > self._max_count) or \
+                   (self._max_size and self._stored_size() > self._max_size * 1024 * 1024)):
+                name = lru.pop(0)[1]
+                self._remove(name)
+                removed.append(name)
+
+            if removed:
+                self._write_index()
+
+        for name in removed:
+            VfrLogger.debug("Archive: {} removed".format(name))
+
+        return removed
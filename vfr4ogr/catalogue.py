@@ -0,0 +1,214 @@
+###############################################################################
+#
+# VFR importer based on GDAL library
+#
+# Author: Martin Landa <landa.martin gmail.com>
+#
+# Licence: MIT/X
+#
+###############################################################################
+
+import os
+import re
+import json
+import time
+
+from .exception import VfrError
+from .logger import VfrLogger
+
+# name of cached catalogue in data directory
+CATALOGUE_FILE = 'catalogue.json'
+
+# pattern of published VFR files (date, type)
+FILE_PATTERN = re.compile(r'(\d{8})_([A-Z0-9_]+?)\.xml\.(zip|gz)')
+
+class Catalogue:
+    def __init__(self, path, sources, ttl=24, downloader=None):
+        """Local catalogue of published VFR files.
+
+        Listings of published files are read from sources (HTML
+        directory listing or list of links, URL or local file) at
+        most once per TTL and cached in data directory. Dates and
+        types of VFR files are then resolved without network access.
+
+        @param path: data directory where catalogue is cached
+        @param sources: list of URLs or local files with listings
+        @param ttl: time to live of cached catalogue in hours (0 to refresh always)
+        @param downloader: Downloader instance used for remote sources
+        """
+        self._cache_file = os.path.join(path, CATALOGUE_FILE)
+        self._sources = sources
+        self._ttl = ttl
+        self._downloader = downloader
+        self._files = None
+        self._failed = False
+        self._fresh = False # sources read in this run
+
+    @staticmethod
+    def parse(content):
+        """Parse listing of published files.
+
+        @param content: listing as string
+
+        @return set of file names
+        """
+        return set(m.group(0) for m in FILE_PATTERN.finditer(content))
+
+    def _read_source(self, source):
+        """Read listing from URL or local file.
+
+        Raise VfrError on error.
+
+        @param source: URL or file name
+
+        @return listing as string
+        """
+        if os.path.isfile(source):
+            with open(source) as fd:
+                return fd.read()
+        if not self._downloader:
+            raise VfrError("No downloader available for '%s'" % source)
+
+        return self._downloader.read(source).decode('utf-8', 'replace')
+
+    def _read_cache(self):
+        """Read cached catalogue.
+
+        @return tuple (time of update, set of file names) or (None, None)
+        """
+        if not os.path.exists(self._cache_file):
+            return None, None
+        try:
+            with open(self._cache_file) as fd:
+                data = json.load(fd)
+            if data.get('sources') != self._sources:
+                return None, None # sources changed
+            return data['updated'], set(data['files'])
+        except (ValueError, KeyError) as e:
+            VfrLogger.warning("Invalid catalogue '%s' (%s)" % (self._cache_file, e))
+            return None, None
+
+    def refresh(self, force=False):
+        """Refresh catalogue if cached one is older than TTL.
+
+        Stale catalogue is used when sources are not available.
+
+        @param force: True to refresh regardless TTL
+
+        @return True if catalogue is available otherwise False
+        """
+        updated, cached = self._read_cache()
+        if not force and updated and time.time() - updated < self._ttl * 3600:
+            self._failed = False
+            self._fresh = False # may be refreshed once on miss
+            self._files = cached
+            return True
+
+        self._fresh = True
+        try:
+            files = set()
+            for source in self._sources:
+                files.update(self.parse(self._read_source(source)))
+            if not files:
+                raise VfrError("no VFR files listed")
+        except VfrError as e:
+            if cached is not None:
+                VfrLogger.warning("Unable to refresh catalogue ({}), using "
+                                  "catalogue from {}".format(e, time.ctime(updated)))
+                self._files = cached
+                return True
+            VfrLogger.warning("Unable to read catalogue: {}".format(e))
+            self._failed = True
+            return False
+
+        self._failed = False
+        self._files = files
+        tmp_file = self._cache_file + '.tmp'
+        with open(tmp_file, 'w') as fd:
+            json.dump({ 'updated' : time.time(),
+                        'sources' : self._sources,
+                        'files' : sorted(self._files) }, fd, indent=2)
+        os.replace(tmp_file, self._cache_file)
+        VfrLogger.debug("Catalogue refreshed: {} files".format(len(self._files)))
+
+        return True
+
+    def available(self):
+        """Check if catalogue is available (refreshed when needed).
+
+        Sources are read only once per run when not available.
+        """
+        if self._files is None:
+            return False if self._failed else self.refresh()
+        return True
+
+    def covers(self, url):
+        """Check if URL is covered by catalogue sources.
+
+        @param url: URL of VFR file
+
+        @return True if covered otherwise False
+        """
+        return any(os.path.isfile(source) or url.startswith(source) \
+                   for source in self._sources)
+
+    def refresh_once(self):
+        """Refresh catalogue from sources unless already done in this
+        run (cached listing may predate publication of new files).
+
+        @return True if catalogue was refreshed otherwise False
+        """
+        if self._fresh:
+            return False
+
+        return self.refresh(force=True)
+
+    def __contains__(self, name):
+        if not self.available():
+            return False
+        name = os.path.basename(name)
+        if name not in self._files and self.refresh_once():
+            VfrLogger.debug("Catalogue refreshed on miss ({})".format(name))
+
+        return name in self._files
+
+    def dates(self, ftype, sdate=None, edate=None):
+        """Get dates of published files of given type.
+
+        @param ftype: file type (eg. ST_ZKSH)
+        @param sdate: first date YYYYMMDD (None for unlimited)
+        @param edate: last date YYYYMMDD (None for unlimited)
+
+        @return sorted list of dates
+        """
+        if not self.available():
+            return []
+
+        dlist = self._dates(ftype, sdate, edate)
+        if edate and (not dlist or dlist[-1] < edate) and self.refresh_once():
+            # last day may be published after cached listing
+            dlist = self._dates(ftype, sdate, edate)
+
+        return dlist
+
+    def _dates(self, ftype, sdate, edate):
+        dlist = set()
+        for name in self._files:
+            match = FILE_PATTERN.match(name)
+            if match and match.group(2) == ftype and \
+               (not sdate or match.group(1) >= sdate) and \
+               (not edate or match.group(1) <= edate):
+                dlist.add(match.group(1))
+
+        return sorted(dlist)
+
+    def latest(self, ftype):
+        """Get date of last published file of given type.
+
+        @param ftype: file type (eg. ST_UKSH)
+
+        @return date YYYYMMDD or None if not found
+        """
+        dlist = self.dates(ftype)
+
+        return dlist[-1] if dlist else None
@@ -0,0 +1,259 @@
+###############################################################################
+#
+# VFR importer based on GDAL library
+#
+# Author: Martin Landa <landa.martin gmail.com>
+#
+# Licence: MIT/X
+#
+###############################################################################
+
+import os
+import heapq
+import sqlite3
+import tempfile
+import weakref
+from array import array
+from bisect import bisect_left
+
+# size of one change in memory (input fid, action, output fid) in bytes
+CHANGE_SIZE = 17
+
+# max number of changes sorted at once (see ChangeMap._sort())
+SORT_CHUNK = 65536
+
+def max_changes(max_memory):
+    """Get number of changes which can be kept in memory.
+
+    Sorting needs a copy of changes and their positions (int64), so
+    the budget is shared between changes and sort buffers.
+
+    @param max_memory: memory budget in MB (None for unlimited)
+
+    @return number of changes or None for unlimited
+    """
+    if not max_memory:
+        return None
+
+    return max(1, int(max_memory * 1024 * 1024 / (2 * CHANGE_SIZE + 8)))
+
+class ChangeBudget:
+    def __init__(self, max_size=None):
+        """Number of changes kept in memory shared by all change maps
+        of one process (see ChangeMap).
+
+        When max size is reached, the largest map is moved into its
+        database.
+
+        @param max_size: max number of changes kept in memory (None for unlimited)
+        """
+        self.max_size = max_size
+        self.size = 0
+        self._maps = weakref.WeakSet()
+
+    def register(self, cmap):
+        """Register change map sharing this budget.
+
+        @param cmap: ChangeMap instance
+        """
+        self._maps.add(cmap)
+
+    def check(self):
+        """Move changes into database when budget is exceeded.
+        """
+        if not self.max_size or self.size < self.max_size:
+            return
+
+        cmap = max(self._maps, key=lambda m: len(m._fids), default=None)
+        if cmap is not None:
+            cmap._flush(force=True)
+
+class ChangeMap:
+    def __init__(self, budget=None):
+        """Map of changes (input fid -> (action, output fid)).
+
+        Changes are kept in memory as parallel typed arrays (int64
+        input fid, int8 action, int64 output fid) sorted by input fid
+        for binary search. When memory budget is reached, changes are
+        moved into temporary SQLite database.
+
+        @param budget: ChangeBudget shared with other maps (None for unlimited)
+        """
+        self._budget = budget if budget is not None else ChangeBudget()
+        self._budget.register(self)
+        self._fids = array('q')
+        self._reset()
+        self._db = None
+        self._db_file = None
+
+    def _reset(self):
+        """Clear changes kept in memory.
+        """
+        self._budget.size -= len(self._fids)
+        self._fids = array('q')
+        self._actions = array('b')
+        self._ofids = array('q')
+        self._sorted = True
+
+    def __del__(self):
+        self._reset()
+        self.close()
+
+    def __len__(self):
+        self._flush()
+        if self._db:
+            return self._db.execute("SELECT COUNT(*) FROM changes").fetchone()[0]
+        self._sort()
+        return len(self._fids)
+
+    def __contains__(self, fid):
+        return self.get(fid) is not None
+
+    def __setitem__(self, fid, value):
+        if self._sorted and self._fids and fid <= self._fids[-1]:
+            self._sorted = False
+        self._fids.append(fid)
+        self._actions.append(value[0])
+        self._ofids.append(value[1])
+        self._budget.size += 1
+        self._budget.check()
+
+    def __getitem__(self, fid):
+        value = self.get(fid)
+        if value is None:
+            raise KeyError(fid)
+        return value
+
+    def _sort(self):
+        """Sort changes kept in memory by input fid.
+
+        If input fid is duplicated, the last change is kept.
+
+        Chunks of changes are sorted separately (positions are kept
+        as int64 arrays) and merged, so no list of all positions is
+        created.
+        """
+        if self._sorted:
+            return
+
+        fids, actions, ofids = self._fids, self._actions, self._ofids
+        runs = []
+        for start in range(0, len(fids), SORT_CHUNK):
+            runs.append(array('q', sorted(range(start, min(len(fids), start + SORT_CHUNK)),
+                                          key=fids.__getitem__)))
+
+        # merge is stable (runs are ordered by position), last item
+        # of equal fids wins
+        sfids, sactions, sofids = array('q'), array('b'), array('q')
+        last = None
+        for i in heapq.merge(*runs, key=fids.__getitem__):
+            if last is not None and fids[i] == fids[last]:
+                sactions[-1] = actions[i]
+                sofids[-1] = ofids[i]
+            else:
+                sfids.append(fids[i])
+                sactions.append(actions[i])
+                sofids.append(ofids[i])
+            last = i
+
+        self._budget.size += len(sfids) - len(fids)
+        self._fids, self._actions, self._ofids = sfids, sactions, sofids
+        self._sorted = True
+
+    def _flush(self, force=False):
+        """Move changes from memory into database.
+
+        @param force: True to create database if not exists
+        """
+        if not self._fids or (not self._db and not force):
+            return
+
+        if not self._db:
+            fd, self._db_file = tempfile.mkstemp(prefix='vfr_changes_', suffix='.db')
+            os.close(fd)
+            self._db = sqlite3.connect(self._db_file)
+            self._db.execute("PRAGMA synchronous = OFF")
+            self._db.execute("PRAGMA journal_mode = OFF")
+            self._db.execute("CREATE TABLE changes (fid INTEGER PRIMARY KEY, "
+                             "action INTEGER, ofid INTEGER)")
+
+        self._sort()
+        self._db.executemany("INSERT OR REPLACE INTO changes VALUES (?, ?, ?)",
+                             zip(self._fids, self._actions, self._ofids))
+        self._db.commit()
+        self._reset()
+
+    def get(self, fid, default=None):
+        """Get change for given input fid.
+
+        @param fid: input feature id
+        @param default: value returned if not found
+
+        @return tuple (action, output fid)
+        """
+        self._sort()
+        i = bisect_left(self._fids, fid)
+        if i < len(self._fids) and self._fids[i] == fid:
+            return self._actions[i], self._ofids[i]
+        if self._db:
+            row = self._db.execute("SELECT action, ofid FROM changes WHERE fid = ?",
+                                   (fid,)).fetchone()
+            if row:
+                return tuple(row)
+        return default
+
+    def update(self, other):
+        """Add changes from other map.
+
+        @param other: ChangeMap or dictionary
+        """
+        for fid, value in other.items():
+            self[fid] = value
+
+    def items(self):
+        """Iterate changes as tuples (input fid, (action, output fid)).
+        """
+        self._flush()
+        if self._db:
+            for fid, action, ofid in self._db.execute("SELECT fid, action, ofid FROM changes"):
+                yield fid, (action, ofid)
+        else:
+            self._sort()
+            for i in range(len(self._fids)):
+                yield self._fids[i], (self._actions[i], self._ofids[i])
+
+    def keys(self):
+        """Iterate input fids.
+        """
+        for fid, unused in self.items():
+            yield fid
+
+    def values(self):
+        """Iterate changes as tuples (action, output fid).
+        """
+        for unused, value in self.items():
+            yield value
+
+    def count(self, action):
+        """Get number of changes with given action.
+
+        @param action: action (see Action class)
+
+        @return number of changes
+        """
+        self._flush()
+        if self._db:
+            return self._db.execute("SELECT COUNT(*) FROM changes WHERE action = ?",
+                                    (action,)).fetchone()[0]
+        self._sort()
+        return self._actions.count(action)
+
+    def close(self):
+        """Remove temporary database if exists.
+        """
+        if self._db:
+            self._db.close()
+            self._db = None
+        if self._db_file and os.path.exists(self._db_file):
+            os.remove(self._db_file)
+        self._db_file = None
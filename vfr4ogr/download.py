@@ -0,0 +1,261 @@
+###############################################################################
+#
+# VFR importer based on GDAL library
+#
+# Author: Martin Landa <landa.martin gmail.com>
+#
+# Licence: MIT/X
+#
+###############################################################################
+
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+try:
+    # Python 2
+    from httplib import HTTPConnection, HTTPSConnection, HTTPException
+    from urlparse import urlsplit, urljoin
+except ImportError:
+    # Python 3
+    from http.client import HTTPConnection, HTTPSConnection, HTTPException
+    from urllib.parse import urlsplit, urljoin
+
+from .exception import VfrError
+from .logger import VfrLogger
+
+# size of chunks written to local file
+CHUNK_SIZE = 1024 * 1024
+
+# max number of followed redirects
+MAX_REDIRECTS = 5
+
+# max number of concurrent probes (HEAD requests), independent of jobs
+PROBE_JOBS = 4
+
+class Downloader:
+    def __init__(self, jobs=1, timeout=60, probe_jobs=PROBE_JOBS):
+        """HTTP(S) client downloading VFR files.
+
+        Connections are kept alive and reused by subsequent requests
+        to the same host (one connection per host and thread). Probes
+        (HEAD requests) and downloads of more files run in parallel
+        by worker threads created once and reused by all requests (so
+        number of connections is bounded).
+
+        @param jobs: number of parallel requests
+        @param timeout: timeout of connections in seconds
+        @param probe_jobs: number of concurrent probes of one file
+        """
+        self._jobs = max(1, jobs)
+        self._probe_jobs = max(1, probe_jobs)
+        self._timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._conns = []
+        self._pools = {} # see _get_pool()
+        self.metrics = []
+
+    def __del__(self):
+        self.close()
+
+    def _get_pool(self, name, size):
+        """Get worker pool (created on demand and reused, threads keep
+        their connections).
+
+        Probes and downloads use separate pools (probes are
+        submitted by download workers).
+
+        @param name: pool name ('probe' or 'download')
+        @param size: number of threads
+
+        @return executor instance
+        """
+        with self._lock:
+            if name not in self._pools:
+                self._pools[name] = ThreadPoolExecutor(size)
+            return self._pools[name]
+
+    def _get_connection(self, scheme, netloc):
+        """Get connection of current thread for given host.
+
+        @param scheme: URL scheme (http or https)
+        @param netloc: host name (and port)
+
+        @return connection instance
+        """
+        if not hasattr(self._local, 'conns'):
+            self._local.conns = {}
+        key = (scheme, netloc)
+        if key not in self._local.conns:
+            if scheme == 'https':
+                conn = HTTPSConnection(netloc, timeout=self._timeout)
+            elif scheme == 'http':
+                conn = HTTPConnection(netloc, timeout=self._timeout)
+            else:
+                raise VfrError("Unsupported URL scheme '%s'" % scheme)
+            self._local.conns[key] = conn
+            with self._lock:
+                self._conns.append(conn)
+
+        return self._local.conns[key]
+
+    def _request(self, method, url):
+        """Send request, follow redirects.
+
+        Connection is reopened once when closed by server.
+
+        @param method: HTTP method (GET or HEAD)
+        @param url: URL
+
+        @return response instance (must be read before next request)
+        """
+        for unused in range(MAX_REDIRECTS + 1):
+            parts = urlsplit(url)
+            path = parts.path if parts.path else '/'
+            if parts.query:
+                path += '?' + parts.query
+            conn = self._get_connection(parts.scheme, parts.netloc)
+            for attempt in range(2):
+                try:
+                    conn.request(method, path, headers={'Connection' : 'keep-alive'})
+                    response = conn.getresponse()
+                    break
+                except (HTTPException, OSError) as e:
+                    conn.close()
+                    if attempt > 0:
+                        raise VfrError("Unable to download '%s': %s" % (url, e))
+
+            if response.status in (301, 302, 303, 307, 308):
+                response.read()
+                url = urljoin(url, response.getheader('Location'))
+                continue
+
+            return response
+
+        raise VfrError("Too many redirects: '%s'" % url)
+
+    def exists(self, url):
+        """Check if remote file exists (HEAD request).
+
+        @param url: URL
+
+        @return True if exists otherwise False
+        """
+        response = self._request('HEAD', url)
+        response.read()
+
+        return response.status == 200
+
+    def probe(self, urls):
+        """Find first existing file from list of candidates.
+
+        Candidates are probed concurrently (see probe_jobs).
+
+        @param urls: list of URLs
+
+        @return first existing URL (in order given by list) or None
+        """
+        if len(urls) == 1:
+            return urls[0] if self.exists(urls[0]) else None
+
+        pool = self._get_pool('probe', self._probe_jobs)
+        for url, found in zip(urls, pool.map(self.exists, urls)):
+            if found:
+                return url
+
+        return None
+
+    def fetch(self, url, local_file):
+        """Download file.
+
+        Data are written into temporary file which is renamed when
+        download is finished (no incomplete files are left).
+
+        Raise VfrError on error.
+
+        @param url: URL
+        @param local_file: path to local file
+
+        @return metrics (dictionary with url, size, time and bandwidth)
+        """
+        stime = time.time()
+        response = self._request('GET', url)
+        if response.status != 200:
+            response.read()
+            if response.status == 404:
+                raise VfrError("File '%s' not found" % url)
+            raise VfrError("Unable to download '%s': HTTP %d" % (url, response.status))
+
+        latency = time.time() - stime
+        size = 0
+        tmp_file = local_file + '.part'
+        try:
+            with open(tmp_file, 'wb') as fd:
+                while True:
+                    chunk = response.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    fd.write(chunk)
+                    size += len(chunk)
+        except (HTTPException, OSError) as e:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            raise VfrError("Unable to download '%s': %s" % (url, e))
+        os.rename(tmp_file, local_file)
+
+        elapsed = time.time() - stime
+        metrics = { 'url' : url,
+                    'size' : size,
+                    'latency' : round(latency, 3),
+                    'time' : round(elapsed, 3),
+                    'bandwidth' : round(size / elapsed / (1024. * 1024.), 3) if elapsed > 0 else None }
+        with self._lock:
+            self.metrics.append(metrics)
+        VfrLogger.debug("Downloaded {url}: {size} bytes, latency {latency}s, "
+                        "{time}s, {bandwidth} MB/s".format(**metrics))
+
+        return metrics
+
+    def read(self, url):
+        """Read content of remote file (eg. file listing).
+
+        Raise VfrError on error.
+
+        @param url: URL
+
+        @return content as bytes
+        """
+        response = self._request('GET', url)
+        content = response.read()
+        if response.status != 200:
+            raise VfrError("Unable to read '%s': HTTP %d" % (url, response.status))
+
+        return content
+
+    def map(self, func, items):
+        """Call function for each item in parallel.
+
+        @param func: function to be called
+        @param items: list of items
+
+        @return list of results (in order given by items)
+        """
+        if self._jobs < 2 or len(items) < 2:
+            return list(map(func, items))
+
+        return list(self._get_pool('download', self._jobs).map(func, items))
+
+    def close(self):
+        """Shut down worker pools and close all connections.
+        """
+        with self._lock:
+            pools = list(self._pools.values())
+            self._pools = {}
+        for pool in pools:
+            pool.shutdown()
+        with self._lock:
+            for conn in self._conns:
+                conn.close()
+            self._conns = []
+        self._local = threading.local()
@@ -0,0 +1,135 @@
+###############################################################################
+#
+# VFR importer based on GDAL library
+#
+# Author: Martin Landa <landa.martin gmail.com>
+#
+# Licence: MIT/X
+#
+###############################################################################
+
+import sys
+import threading
+try:
+    # Python 2
+    from Queue import Queue
+except ImportError:
+    # Python 3
+    from queue import Queue
+
+try:
+    from osgeo import ogr
+except ImportError as e:
+    sys.exit('ERROR: Import of ogr from osgeo failed. %s' % e)
+
+from .exception import VfrError
+
+# max number of features waiting in queue of one writer
+QUEUE_SIZE = 10000
+
+class OutputWriter(threading.Thread):
+    def __init__(self, output, olayer, layer_name, keep_fid=True, ncount=0,
+                 commit_every=0):
+        """Thread writing features into layer of additional output
+        datasource (see outputs in VfrOgr class).
+
+        Features are written in own transaction. Output layer must be
+        created by the caller, the datasource cannot be used by other
+        threads until finish() is called.
+
+        @param output: VfrOgr instance of output datasource
+        @param olayer: output layer instance
+        @param layer_name: name of output layer
+        @param keep_fid: False to let driver assign feature ids
+        @param ncount: number of features already stored in output layer
+        @param commit_every: number of features per transaction (0 for one transaction)
+        """
+        threading.Thread.__init__(self, name='vfr-writer-%s' % layer_name)
+        self.daemon = True
+        self.output = output
+        self._olayer = olayer
+        self._layer_name = layer_name
+        self._keep_fid = keep_fid
+        self._commit_every = commit_every
+        self._queue = Queue(maxsize=QUEUE_SIZE)
+        self._error = None
+        self.ncount = ncount
+        self.start()
+
+    def run(self):
+        defn = self._olayer.GetLayerDefn()
+        nfields = defn.GetFieldCount()
+        field_map = None
+        ofeature = None
+        nwritten = 0
+        transaction = self._olayer.TestCapability(ogr.OLCTransactions)
+        if transaction:
+            self._olayer.StartTransaction()
+        while True:
+            feature = self._queue.get()
+            if feature is None:
+                break
+            if self._error:
+                continue # drain queue
+            try:
+                if field_map is None:
+                    # fields are created in the same order as in
+                    # primary output (names may be truncated)
+                    if feature.GetFieldCount() == nfields:
+                        field_map = list(range(nfields))
+                    else:
+                        field_map = []
+                if ofeature is None:
+                    # reused for all features (fields and geometries
+                    # are overwritten)
+                    ofeature = ogr.Feature(defn)
+                if field_map:
+                    ofeature.SetFromWithMap(feature, True, field_map)
+                else:
+                    ofeature.SetFrom(feature, True)
+                ofeature.SetFID(feature.GetFID() if self._keep_fid else ogr.NullFID)
+                if self._olayer.CreateFeature(ofeature) == 0:
+                    self.ncount += 1
+                nwritten += 1
+                if transaction and self._commit_every and \
+                   nwritten % self._commit_every == 0:
+                    self._olayer.CommitTransaction()
+                    self._olayer.StartTransaction()
+            except Exception as e:
+                self._error = e
+        if transaction:
+            if self._error:
+                self._olayer.RollbackTransaction()
+            else:
+                self._olayer.CommitTransaction()
+
+    def write(self, feature):
+        """Queue feature to be written (copy is made).
+
+        @param feature: feature instance
+        """
+        self._queue.put(feature.Clone())
+
+    def abort(self):
+        """Stop writing (eg. on error of primary output), queued
+        features are dropped and transaction is rolled back.
+        """
+        if not self._error:
+            self._error = VfrError("Writing aborted")
+        self._queue.put(None)
+        self.join()
+
+    def finish(self):
+        """Wait until all features are written.
+
+        Raise VfrError on error.
+
+        @return number of written features
+        """
+        self._queue.put(None)
+        self.join()
+        if self._error:
+            raise VfrError("Unable to write layer '%s' into '%s': %s" % \
+                           (self._layer_name, self.output.odsn, self._error))
+
+        return self.ncount
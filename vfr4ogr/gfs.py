@@ -0,0 +1,354 @@
+###############################################################################
+#
+# VFR importer based on GDAL library
+#
+# Author: Martin Landa <landa.martin gmail.com>
+#
+# Licence: MIT/X
+#
+###############################################################################
+
+"""
+Tools for GML feature class schema (GFS) files used by GDAL GML driver.
+
+Merged GFS files (ruian_vf_*_v1.gfs) are generated from per-layer GFS
+files, validated against sample VFR files and trimmed to selected
+layers and columns.
+"""
+
+import os
+import sys
+import gzip
+import zipfile
+import argparse
+import xml.etree.ElementTree as ET  # nosec B405
+
+from .exception import VfrError
+
+# directory with per-layer GFS files
+GFS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'gfs')
+
+# merged GFS files (name -> list of layers)
+MERGED_GFS = {
+    'ruian_vf_st_v1' : ['Staty', 'RegionySoudrznosti', 'Vusc', 'Okresy', 'Orp',
+                        'Pou', 'Obce', 'SpravniObvody', 'Mop', 'Momc', 'CastiObci',
+                        'KatastralniUzemi', 'Zsj'],
+    'ruian_vf_ob_v1' : ['Obce', 'SpravniObvody', 'Mop', 'Momc', 'CastiObci',
+                        'KatastralniUzemi', 'Zsj', 'Ulice', 'Parcely',
+                        'StavebniObjekty', 'AdresniMista'],
+    'ruian_vf_v1' : ['Staty', 'RegionySoudrznosti', 'Vusc', 'Okresy', 'Orp',
+                     'Pou', 'Obce', 'SpravniObvody', 'Mop', 'Momc', 'CastiObci',
+                     'KatastralniUzemi', 'Zsj', 'Ulice', 'Parcely',
+                     'StavebniObjekty', 'AdresniMista', 'ZaniklePrvky'],
+}
+
+# namespace of GML geometry elements
+GML_NS = '{http://www.opengis.net/gml'
+
+# columns always kept in trimmed GFS
+KEY_COLUMNS = ('Kod', 'Id')
+
+def read_gfs(filename):
+    """Read GFS file (comments are preserved).
+
+    Raise VfrError on error.
+
+    @param filename: GFS file name
+
+    @return root element (GMLFeatureClassList)
+    """
+    parser = ET.XMLParser(target=ET.TreeBuilder(insert_comments=True))  # nosec B314
+    try:
+        root = ET.parse(filename, parser=parser).getroot()
+    except (IOError, ET.ParseError) as e:
+        raise VfrError("Unable to read GFS file '%s': %s" % (filename, e))
+    if root.tag != 'GMLFeatureClassList':
+        raise VfrError("'%s' is not valid GFS file" % filename)
+
+    return root
+
+def write_gfs(root, filename):
+    """Write GFS file.
+
+    @param root: root element (see read_gfs())
+    @param filename: output file name
+    """
+    with open(filename, 'w', encoding='utf-8') as fd:
+        fd.write(ET.tostring(root, encoding='unicode'))
+        fd.write('\n')
+
+def feature_classes(root):
+    """Get feature classes defined in GFS.
+
+    @param root: root element (see read_gfs())
+
+    @return dictionary (class name -> GMLFeatureClass element)
+    """
+    return dict((cls.findtext('Name'), cls) for cls in root.iter('GMLFeatureClass'))
+
+def merge_gfs(layers, gfs_dir=GFS_DIR):
+    """Merge per-layer GFS files.
+
+    Raise VfrError on error.
+
+    @param layers: list of layer names (GFS files in gfs_dir)
+    @param gfs_dir: directory with per-layer GFS files
+
+    @return root element of merged GFS
+    """
+    root = ET.Element('GMLFeatureClassList')
+    root.text = '\n  '
+    for layer in layers:
+        # comments and feature classes, closing whitespace is
+        # taken from the last file
+        children = list(read_gfs(os.path.join(gfs_dir, layer + '.gfs')))
+        root.extend(children)
+        if children:
+            children[-1].tail = '\n  '
+    if len(root):
+        root[-1].tail = '\n'
+
+    return root
+
+def generate(gfs_dir=GFS_DIR, output_dir=None):
+    """Generate merged GFS files (see MERGED_GFS).
+
+    @param gfs_dir: directory with per-layer GFS files
+    @param output_dir: output directory (default: gfs_dir)
+
+    @return list of generated files
+    """
+    if not output_dir:
+        output_dir = gfs_dir
+
+    file_list = []
+    for name in sorted(MERGED_GFS.keys()):
+        filename = os.path.join(output_dir, name + '.gfs')
+        write_gfs(merge_gfs(MERGED_GFS[name], gfs_dir), filename)
+        file_list.append(filename)
+
+    return file_list
+
+def trim_gfs(root, layers=None, columns=None):
+    """Trim GFS to selected layers and columns.
+
+    Key columns (see KEY_COLUMNS) are always kept. If columns of a
+    layer contain no geometry column, all geometry columns are kept.
+    Column names are compared case-insensitive.
+
+    @param root: root element (see read_gfs())
+    @param layers: list of layers to be kept (None for all)
+    @param columns: dictionary (layer name -> list of columns to be kept)
+
+    @return root element of trimmed GFS
+    """
+    columns = dict((name, [c.lower() for c in cols]) \
+                   for name, cols in (columns if columns else {}).items())
+    keys = [c.lower() for c in KEY_COLUMNS]
+    troot = ET.Element('GMLFeatureClassList')
+    troot.text = '\n  '
+    for cls in root.iter('GMLFeatureClass'):
+        name = cls.findtext('Name')
+        if layers and name not in layers:
+            continue
+
+        tcls = ET.SubElement(troot, 'GMLFeatureClass')
+        tcls.text = cls.text
+        tcls.tail = '\n  '
+        selected = columns.get(name)
+        geoms = [g.findtext('Name').lower() for g in cls.findall('GeomPropertyDefn')]
+        keep_geoms = not selected or not any(g in selected for g in geoms)
+        for child in cls:
+            if child.tag is ET.Comment:
+                continue
+            cname = (child.findtext('Name') or '').lower()
+            if selected and child.tag == 'PropertyDefn' and \
+               cname not in selected and cname not in keys:
+                continue
+            if not keep_geoms and child.tag == 'GeomPropertyDefn' and \
+               cname not in selected:
+                continue
+            tcls.append(child)
+        if len(tcls):
+            tcls[-1].tail = '\n  '
+    if len(troot):
+        troot[-1].tail = '\n'
+
+    return troot
+
+def _open_xml(filename):
+    """Open VFR file for reading (plain, gzip or zip compressed).
+
+    @param filename: file name
+
+    @return file object
+    """
+    if filename.endswith('.gz'):
+        return gzip.open(filename, 'rb')
+    if filename.endswith('.zip'):
+        zfile = zipfile.ZipFile(filename)
+        return zfile.open(zfile.namelist()[0])
+
+    return open(filename, 'rb')
+
+def _local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+def _check_value(prop, value):
+    """Check value of attribute against property definition.
+
+    @param prop: PropertyDefn element
+    @param value: value as string
+
+    @return error message or None
+    """
+    ptype = prop.findtext('Type')
+    try:
+        if ptype == 'Integer':
+            int(value)
+        elif ptype == 'Real':
+            float(value)
+    except ValueError:
+        return "invalid %s value '%s'" % (ptype.lower(), value)
+
+    width = prop.findtext('Width')
+    if ptype == 'String' and width and len(value) > int(width):
+        return "value '%s' exceeds width %s" % (value, width)
+
+    return None
+
+def validate_gfs(root, filename):
+    """Validate GFS against VFR file.
+
+    The file is scanned as a stream, features are not kept in memory.
+    Feature classes, elements and values (type, width) which don't
+    match GFS definition are reported.
+
+    Raise VfrError on error.
+
+    @param root: root element (see read_gfs())
+    @param filename: VFR file (plain, gzip or zip compressed)
+
+    @return tuple (dictionary class name -> number of features, list of problems)
+    """
+    classes = {}
+    for name, cls in feature_classes(root).items():
+        path = tuple(cls.findtext('ElementPath').split('|'))
+        props = dict((tuple(p.findtext('ElementPath').split('|')), p)
+                     for p in cls.findall('PropertyDefn'))
+        geoms = set(tuple(g.findtext('ElementPath').split('|'))
+                    for g in cls.findall('GeomPropertyDefn'))
+        classes[path] = (name, props, geoms)
+
+    counts = {}
+    problems = set()
+    stack = []       # path of local names from document root
+    feature = None   # (depth, class definition) of current feature
+    skip = None      # depth of geometry (gml:*) element being skipped
+    try:
+        with _open_xml(filename) as fd:
+            for event, elem in ET.iterparse(fd, events=('start', 'end')):  # nosec B314
+                if event == 'start':
+                    stack.append(_local_name(elem.tag))
+                    if skip is not None or feature is None:
+                        if feature is None and len(stack) == 4 and stack[1] == 'Data':
+                            path = tuple(stack[1:])
+                            if path not in classes:
+                                problems.add("%s: feature class not described" % '|'.join(path))
+                                skip = len(stack)
+                            else:
+                                feature = (len(stack), classes[path])
+                        continue
+                    name, props, geoms = feature[1]
+                    rel = tuple(stack[feature[0]:])
+                    if rel in geoms:
+                        skip = len(stack) # geometry is not inspected
+                    elif elem.tag.startswith(GML_NS):
+                        problems.add("%s: geometry %s not described" % (name, '|'.join(rel[:-1])))
+                        skip = len(stack)
+                    continue
+
+                # end event
+                depth = len(stack)
+                if skip is not None:
+                    if depth == skip:
+                        skip = None
+                elif feature is not None:
+                    name, props, geoms = feature[1]
+                    if depth == feature[0]:
+                        counts[name] = counts.get(name, 0) + 1
+                        feature = None
+                        elem.clear()
+                    elif len(elem) == 0:
+                        # leaf element, compare with property definitions
+                        rel = tuple(stack[feature[0]:])
+                        if rel in props:
+                            msg = _check_value(props[rel], (elem.text or '').strip())
+                            if msg:
+                                problems.add("%s.%s: %s" % (name, props[rel].findtext('Name'), msg))
+                        elif not any(rel[:len(g)] == g for g in geoms):
+                            problems.add("%s: element %s not described" % (name, '|'.join(rel)))
+                if depth <= 3:
+                    elem.clear()
+                stack.pop()
+    except (IOError, ET.ParseError, zipfile.BadZipfile) as e:
+        raise VfrError("Unable to read file '%s': %s" % (filename, e))
+
+    return counts, sorted(problems)
+
+def main():
+    parser = argparse.ArgumentParser(prog="vfr4ogr.gfs",
+                                     description="Generates, validates and trims GFS files for VFR data.")
+    subparsers = parser.add_subparsers(dest='command')
+
+    parser_merge = subparsers.add_parser('merge', help="Generate merged GFS files")
+    parser_merge.add_argument("--gfs-dir", default=GFS_DIR,
+                              help="Directory with per-layer GFS files")
+    parser_merge.add_argument("--output-dir",
+                              help="Output directory (default: --gfs-dir)")
+
+    parser_validate = subparsers.add_parser('validate', help="Validate GFS file against VFR files")
+    parser_validate.add_argument("gfs", help="GFS file")
+    parser_validate.add_argument("file", nargs='+', help="VFR file(s)")
+
+    parser_trim = subparsers.add_parser('trim', help="Trim GFS file to selected layers and columns")
+    parser_trim.add_argument("gfs", help="GFS file")
+    parser_trim.add_argument("output", help="Output GFS file")
+    parser_trim.add_argument("--layer",
+                             help="Keep only selected layers separated by comma")
+    parser_trim.add_argument("--columns",
+                             help="Keep only selected columns given as 'Layer:col1,col2;Layer2:col1' "
+                             "or file with 'Layer=col1,col2' lines")
+
+    options = parser.parse_args()
+    if not options.command:
+        parser.print_help()
+        return 1
+
+    try:
+        if options.command == 'merge':
+            for filename in generate(options.gfs_dir, options.output_dir):
+                print(filename)
+        elif options.command == 'validate':
+            root = read_gfs(options.gfs)
+            nproblems = 0
+            for filename in options.file:
+                counts, problems = validate_gfs(root, filename)
+                print("%s: %d features" % (filename, sum(counts.values())))
+                for problem in problems:
+                    print("  %s" % problem)
+                nproblems += len(problems)
+            return 1 if nproblems else 0
+        elif options.command == 'trim':
+            from .parse import parse_columns
+            columns = parse_columns(options.columns) if options.columns else None
+            write_gfs(trim_gfs(read_gfs(options.gfs),
+                               options.layer.split(',') if options.layer else None,
+                               columns), options.output)
+    except VfrError as e:
+        sys.exit('ERROR: {}'.format(e))
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
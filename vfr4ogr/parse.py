@@ -14,6 +14,62 @@ import sys
 from .utils import read_file, last_day_of_month, yesterday, get_date_interval, list_formats, extension
 from .exception import VfrErrorCmd
 
+def parse_columns(value):
+    """Parse column projection.
+
+    Projection is given as string 'Layer:col1,col2;Layer2:col1' or
+    path to file with one layer per line in format 'Layer=col1,col2'.
+
+    @param value: projection string or file name
+
+    @return dictionary where keys are layer names and items list of columns
+    """
+    if os.path.isfile(value):
+        with open(value) as fd:
+            items = []
+            for line in fd.readlines():
+                line = line.strip()
+                if len(line) < 1 or line.startswith('#'):
+                    continue # skip empty or commented lines
+                items.append(line.replace('=', ':', 1))
+    else:
+        items = value.split(';')
+
+    columns = {}
+    for item in items:
+        try:
+            layer, cols = item.split(':', 1)
+        except ValueError:
+            raise VfrErrorCmd("Invalid column projection '{}'".format(item))
+        columns[layer.strip()] = [c.strip() for c in cols.split(',') if c.strip()]
+
+    return columns
+
+def parse_outputs(values):
+    """Parse additional outputs.
+
+    Each output is given as 'FORMAT:DSN', eg. 'GPKG:ruian.gpkg'.
+
+    @param values: list of outputs
+
+    @return list of dictionaries with keys 'format', 'dsn' and 'lco'
+    """
+    outputs = []
+    for value in values:
+        try:
+            frmt, dsn = value.split(':', 1)
+        except ValueError:
+            raise VfrErrorCmd("Invalid output '{}', 'FORMAT:DSN' expected".format(value))
+        if not frmt or not dsn:
+            raise VfrErrorCmd("Invalid output '{}', 'FORMAT:DSN' expected".format(value))
+        frmt = frmt.replace('_', ' ')
+        lco = []
+        if frmt == 'ESRI Shapefile':
+            lco.append('ENCODING=UTF-8')
+        outputs.append({ 'format' : frmt, 'dsn' : dsn, 'lco' : lco })
+
+    return outputs
+
 def parse_cmd(optdir):
     """Parse command.
 
@@ -49,6 +105,12 @@ def parse_cmd(optdir):
     if filename and ftype:
         raise VfrErrorCmd("--file and --type are mutually exclusive")
 
+    if getattr(optdir, "service", False):
+        if not ftype or not ftype.startswith('ST_Z'):
+            raise VfrErrorCmd("--service requires '--type ST_ZXXX'")
+        if not optdir.dsn and not getattr(optdir, "dbname", None):
+            raise VfrErrorCmd("--service requires output datasource")
+
     date_list = []
     if ftype and not date:
         if ftype.startswith('ST_Z'):
@@ -71,6 +133,39 @@ def parse_cmd(optdir):
     else:
         optdir.layer = []
 
+    if getattr(optdir, "bbox", None):
+        try:
+            optdir.bbox = list(map(float, optdir.bbox.split(',')))
+        except ValueError:
+            optdir.bbox = []
+        if len(optdir.bbox) != 4:
+            raise VfrErrorCmd("Invalid bounding box, 'xmin,ymin,xmax,ymax' expected")
+
+    if getattr(optdir, "obec", None):
+        try:
+            optdir.obec = list(map(int, optdir.obec.split(',')))
+        except ValueError:
+            raise VfrErrorCmd("Invalid municipality code(s) '{}'".format(optdir.obec))
+
+    if getattr(optdir, "columns", None):
+        optdir.columns = parse_columns(optdir.columns)
+
+    if getattr(optdir, "output", None):
+        optdir.output = parse_outputs(optdir.output)
+        if getattr(optdir, "service", False):
+            raise VfrErrorCmd("--output cannot be combined with --service")
+    else:
+        optdir.output = []
+
+    if getattr(optdir, "commit_every", None) is not None and optdir.commit_every < 0:
+        raise VfrErrorCmd("--commit-every must be positive number or 0")
+
+    if getattr(optdir, "simplify", None) is not None and optdir.simplify <= 0:
+        raise VfrErrorCmd("--simplify must be positive number")
+
+    if getattr(optdir, "precision", None) is not None and optdir.precision < 0:
+        raise VfrErrorCmd("--precision must be positive number or 0")
+
     if filename:               # --filename
         file_list = read_file(filename)
     else:                      # --date && --type
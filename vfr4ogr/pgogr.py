@@ -0,0 +1,292 @@
+###############################################################################
+#
+# VFR importer based on GDAL library
+#
+# Author: Martin Landa <landa.martin gmail.com>
+#
+# Licence: MIT/X
+#
+###############################################################################
+
+import sys
+import time
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+try:
+    # Python 2
+    from Queue import Queue
+except ImportError:
+    # Python 3
+    from queue import Queue
+
+try:
+    from osgeo import ogr
+except ImportError as e:
+    sys.exit('ERROR: Import of ogr from osgeo failed. %s' % e)
+
+from .vfrogr import VfrOgr, CONTROL_LAYERS
+from .logger import VfrLogger
+from .exception import VfrError
+
+# number of rows fetched from server-side cursor at once
+FETCH_SIZE = 10000
+
+class PgOgr(VfrOgr):
+    def __init__(self, idsn, schema=None, fetch_size=FETCH_SIZE, **kwargs):
+        """Class for exporting VFR data from PostGIS database into
+        selected format using GDAL library.
+
+        Each geometry column of input table is exported into separate
+        output layer ('<table>_<geometry column>'). Tables are read in
+        parallel (see jobs) by server-side cursors, features are
+        written by the main thread. Only requested columns (see
+        columns) and one geometry column are transferred.
+
+        Raise VfrError on error.
+
+        @param idsn: input datasource name (PG:...)
+        @param schema: name of schema with tables to be exported
+        @param fetch_size: number of rows fetched from server at once
+        @param kwargs: other arguments, see VfrOgr class for details
+        """
+        self._logFile = 'pg2ogr'
+        VfrOgr.__init__(self, **kwargs)
+        self._schema = schema
+        self._fetch_size = max(1, fetch_size)
+
+        try:
+            import psycopg2
+        except ImportError as e:
+            raise VfrError(e)
+
+        # open input database (used for reading table definitions)
+        self._conn_string = idsn[3:]
+        self._idsn = idsn
+        if self._schema:
+            self._idsn += ' active_schema=%s' % self._schema
+        self._idrv = ogr.GetDriverByName('PostgreSQL')
+        if self._idrv is None:
+            raise VfrError("Format '%s' is not supported" % 'PostgreSQL')
+        self._ids = self._idrv.Open(self._idsn, False)
+        if self._ids is None:
+            raise VfrError("Unable to connect to input DB")
+
+    def close(self):
+        """Close input DB and output datasource (see VfrOgr.close()).
+        """
+        if getattr(self, '_ids', None):
+            self._ids.Close()
+            self._ids = None
+        VfrOgr.close(self)
+
+    def list_layers(self):
+        """List tables of input database.
+        """
+        self._list_layers(fd=sys.stdout)
+
+    def _get_jobs(self):
+        """Get list of layers to be exported.
+
+        @return list of tuples (input layer, geometry column, output layer name)
+        """
+        jobs = []
+        for i in range(self._ids.GetLayerCount()):
+            layer = self._ids.GetLayer(i)
+            layer_name = layer.GetName()
+            if layer_name in CONTROL_LAYERS:
+                continue # skip control tables
+            if self._layer_list and layer_name not in self._layer_list:
+                continue
+
+            if '.' in layer_name and self._schema:
+                if layer_name.split('.', 1)[0] != self._schema:
+                    continue # skip table from non-active schema
+
+            defn = layer.GetLayerDefn()
+            for j in range(defn.GetGeomFieldCount()):
+                geom = defn.GetGeomFieldDefn(j).GetName()
+                jobs.append((layer, geom, '%s_%s' % (layer_name, geom)))
+
+        return jobs
+
+    def _get_query(self, layer, geom):
+        """Build SQL query for given layer.
+
+        Only requested columns and one geometry column (as WKB) are
+        selected. Values are casted to types which can be set directly
+        to OGR features.
+
+        @param layer: input layer instance
+        @param geom: name of geometry column
+
+        @return SQL statement
+        """
+        layer_name = layer.GetName()
+        if '.' in layer_name:
+            schema, table = layer_name.split('.', 1)
+        else:
+            schema, table = self._schema if self._schema else 'public', layer_name
+
+        # skip columns not requested (see --columns)
+        self._set_ignored_fields(layer, geom)
+
+        columns = []
+        defn = layer.GetLayerDefn()
+        for i in range(defn.GetFieldCount()):
+            field = defn.GetFieldDefn(i)
+            if field.IsIgnored():
+                continue
+            ftype = field.GetType()
+            if ftype == ogr.OFTReal:
+                cast = '::float8'
+            elif ftype == ogr.OFTRealList:
+                cast = '::float8[]'
+            elif ftype in (ogr.OFTDate, ogr.OFTTime, ogr.OFTDateTime):
+                cast = '::text'
+            else:
+                cast = ''
+            columns.append('"%s"%s' % (field.GetName(), cast))
+        columns.append('ST_AsBinary("%s", \'NDR\')' % geom)
+
+        sql = 'SELECT %s FROM "%s"."%s"' % (','.join(columns), schema, table)
+        if self._nogeomskip:
+            # skip features without geometry
+            sql += ' WHERE "%s" IS NOT NULL' % geom
+
+        return sql
+
+    def _read_layer(self, idx, sql, queue, stop):
+        """Read features by server-side cursor and pass them to the writer.
+
+        Batches of rows are put into queue as tuples (job index,
+        rows), end of reading is marked by (job index, None).
+
+        @param idx: job index
+        @param sql: SQL query (see _get_query())
+        @param queue: queue instance
+        @param stop: event set by the writer on error (reading is stopped)
+        """
+        import psycopg2
+        conn = None
+        try:
+            if stop.is_set():
+                return
+            conn = psycopg2.connect(self._conn_string)
+            cursor = conn.cursor(name='vfr_export_%d' % idx)
+            cursor.itersize = self._fetch_size
+            cursor.execute(sql)
+            while True:
+                rows = cursor.fetchmany(self._fetch_size)
+                if not rows or stop.is_set():
+                    break
+                queue.put((idx, rows))
+            cursor.close()
+        finally:
+            if conn:
+                conn.close()
+            queue.put((idx, None))
+
+    def _write_rows(self, olayer, rows, ofeature):
+        """Write batch of rows into output layer (one transaction).
+
+        @param olayer: output layer instance
+        @param rows: list of rows (attributes and WKB geometry)
+        @param ofeature: output feature reused for all rows
+
+        @return number of written features
+        """
+        nfields = ofeature.GetFieldCount()
+        if olayer.TestCapability(ogr.OLCTransactions):
+            olayer.StartTransaction()
+
+        for row in rows:
+            for i in range(nfields):
+                if row[i] is not None:
+                    ofeature.SetField2(i, row[i])
+                else:
+                    ofeature.UnsetField(i)
+            if row[-1] is not None:
+                ofeature.SetGeometryDirectly(ogr.CreateGeometryFromWkb(bytes(row[-1])))
+            else:
+                ofeature.SetGeometryDirectly(None)
+            ofeature.SetFID(ogr.NullFID) # FID is assigned by driver
+            olayer.CreateFeature(ofeature)
+
+        if olayer.TestCapability(ogr.OLCTransactions):
+            olayer.CommitTransaction()
+
+        return len(rows)
+
+    def export(self):
+        """Export PostGIS layers into output datasource.
+
+        Raise VfrError on error.
+
+        @return number of exported layers
+        """
+        stime = time.time()
+
+        jobs = []
+        for job in self._get_jobs():
+            olayer_name = job[2]
+            if self._ods.GetLayerByName(olayer_name):
+                if not self._overwrite:
+                    VfrLogger.msg("Exporting %-45s... already exists "
+                                  "(use --overwrite to modify existing data)\n" % olayer_name)
+                    continue
+                self._delete_layer(olayer_name)
+            jobs.append(job)
+
+        VfrLogger.msg("%d layer(s) will be exported..." % len(jobs), header=True)
+        if not jobs:
+            return 0
+
+        olayers = {}
+        ofeatures = {} # output feature per layer (reused)
+        nfeat = {}
+        queue = Queue(maxsize=4 * self._jobs)
+        stop = threading.Event()
+        with ThreadPoolExecutor(self._jobs) as pool:
+            # queries are built in advance, OGR datasource is used
+            # only by the main thread
+            futures = [pool.submit(self._read_layer, idx, self._get_query(job[0], job[1]),
+                                   queue, stop)
+                       for idx, job in enumerate(jobs)]
+            ndone = 0
+            try:
+                while ndone < len(jobs):
+                    idx, rows = queue.get()
+                    layer, geom, olayer_name = jobs[idx]
+                    if rows is None:
+                        ndone += 1
+                        if idx in nfeat:
+                            VfrLogger.msg("Exporting %-45s... %10d features\n" % \
+                                          (olayer_name, nfeat[idx]))
+                        continue
+
+                    # output layer is created with first features (no empty layers)
+                    if idx not in olayers:
+                        olayers[idx] = self._create_layer(olayer_name, layer, geom)
+                        ofeatures[idx] = ogr.Feature(olayers[idx].GetLayerDefn())
+                        nfeat[idx] = 0
+                    nfeat[idx] += self._write_rows(olayers[idx], rows, ofeatures[idx])
+            except:
+                # stop readers and drain queue (readers may be blocked
+                # on full queue), then re-raise
+                stop.set()
+                while ndone < len(jobs):
+                    if queue.get()[1] is None:
+                        ndone += 1
+                raise
+
+            for future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    raise VfrError("Unable to export data: %s" % e)
+
+        VfrLogger.msg("Time elapsed: %s" % str(datetime.timedelta(seconds=time.time() - stime)),
+                      header=True)
+
+        return len(olayers)
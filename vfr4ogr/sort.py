@@ -0,0 +1,202 @@
+###############################################################################
+#
+# VFR importer based on GDAL library
+#
+# Author: Martin Landa <landa.martin gmail.com>
+#
+# Licence: MIT/X
+#
+###############################################################################
+
+import sys
+import heapq
+import pickle  # nosec B403
+import tempfile
+
+try:
+    from osgeo import ogr
+except ImportError as e:
+    sys.exit('ERROR: Import of ogr from osgeo failed. %s' % e)
+
+# extent of Czech Republic in S-JTSK (EPSG:5514) with reserve, used
+# to normalize coordinates for Hilbert curve
+SJTSK_EXTENT = (-910000.0, -1240000.0, -420000.0, -920000.0)
+
+# order of Hilbert curve (number of bits per axis)
+HILBERT_ORDER = 16
+
+def hilbert_key(x, y, extent=SJTSK_EXTENT, order=HILBERT_ORDER):
+    """Compute distance of point along Hilbert curve.
+
+    Coordinates out of extent are clamped.
+
+    @param x: x coordinate
+    @param y: y coordinate
+    @param extent: tuple (xmin, ymin, xmax, ymax) covering data
+    @param order: order of the curve
+
+    @return Hilbert key as integer
+    """
+    side = (1 << order) - 1
+    xmin, ymin, xmax, ymax = extent
+    ix = int((x - xmin) / (xmax - xmin) * side)
+    iy = int((y - ymin) / (ymax - ymin) * side)
+    ix = min(max(ix, 0), side)
+    iy = min(max(iy, 0), side)
+
+    d = 0
+    s = 1 << (order - 1)
+    while s > 0:
+        rx = 1 if ix & s else 0
+        ry = 1 if iy & s else 0
+        d += s * s * ((3 * rx) ^ ry)
+        # rotate quadrant
+        if ry == 0:
+            if rx == 1:
+                ix = side - ix
+                iy = side - iy
+            ix, iy = iy, ix
+        s >>= 1
+
+    return d
+
+def feature_key(feature):
+    """Get Hilbert key of feature (center of its geometry envelope).
+
+    Features without geometry are sorted at the end.
+
+    @param feature: feature instance
+
+    @return Hilbert key as integer
+    """
+    geom = feature.GetGeometryRef()
+    if geom is None or geom.IsEmpty():
+        return 1 << (2 * HILBERT_ORDER)
+
+    xmin, xmax, ymin, ymax = geom.GetEnvelope()
+    return hilbert_key((xmin + xmax) / 2., (ymin + ymax) / 2.)
+
+def dump_feature(feature):
+    """Serialize feature attributes and geometries.
+
+    @param feature: feature instance
+
+    @return tuple (list of field values, list of WKB geometries)
+    """
+    fields = []
+    for i in range(feature.GetFieldCount()):
+        if feature.IsFieldSet(i):
+            fields.append(feature.GetField(i))
+        else:
+            fields.append(None)
+
+    geoms = []
+    for i in range(feature.GetGeomFieldCount()):
+        geom = feature.GetGeomFieldRef(i)
+        geoms.append(geom.ExportToWkb() if geom else None)
+
+    return fields, geoms
+
+def load_feature(defn, record, feature=None):
+    """Create feature from serialized record (see dump_feature()).
+
+    @param defn: feature definition of output layer
+    @param record: tuple (list of field values, list of WKB geometries)
+    @param feature: feature instance to be reused (None to create new one)
+
+    @return feature instance
+    """
+    fields, geoms = record
+    if feature is None:
+        feature = ogr.Feature(defn)
+        reset = False
+    else:
+        reset = True
+    for i, value in enumerate(fields):
+        if value is not None:
+            feature.SetField2(i, value)
+        elif reset:
+            feature.UnsetField(i)
+    for i, wkb in enumerate(geoms):
+        if wkb is not None:
+            feature.SetGeomFieldDirectly(i, ogr.CreateGeometryFromWkb(wkb))
+        elif reset:
+            feature.SetGeomFieldDirectly(i, None)
+
+    return feature
+
+class SpatialSorter:
+    def __init__(self, buffer_size=100000):
+        """External merge sort of features by Hilbert key.
+
+        Features are kept in memory up to buffer size, then sorted
+        run is spilled into temporary file. Runs are merged when
+        reading.
+
+        @param buffer_size: max number of features kept in memory
+        """
+        self._buffer_size = buffer_size
+        self._buffer = []
+        self._runs = []
+        self._seq = 0 # keeps order stable for equal keys
+
+    def __del__(self):
+        self.close()
+
+    def __len__(self):
+        return self._seq
+
+    def add(self, feature):
+        """Add feature to be sorted.
+
+        @param feature: feature instance
+        """
+        self._buffer.append((feature_key(feature), self._seq, dump_feature(feature)))
+        self._seq += 1
+        if len(self._buffer) >= self._buffer_size:
+            self._spill()
+
+    def _spill(self):
+        """Write sorted buffer to temporary file.
+        """
+        self._buffer.sort(key=lambda item: item[:2])
+        fd = tempfile.TemporaryFile(prefix='vfr_sort_')
+        for item in self._buffer:
+            pickle.dump(item, fd, pickle.HIGHEST_PROTOCOL)
+        fd.seek(0)
+        self._runs.append(fd)
+        self._buffer = []
+
+    @staticmethod
+    def _read_run(fd):
+        while True:
+            try:
+                yield pickle.load(fd) # nosec B301
+            except EOFError:
+                return
+
+    def features(self, defn, reuse=False):
+        """Iterate features sorted by Hilbert key.
+
+        @param defn: feature definition of output layer
+        @param reuse: True to yield the same feature instance filled
+        with next record (valid only until next iteration)
+
+        @return generator of feature instances
+        """
+        self._buffer.sort(key=lambda item: item[:2])
+        runs = [self._read_run(fd) for fd in self._runs]
+        runs.append(iter(self._buffer))
+        feature = ogr.Feature(defn) if reuse else None
+        for unused, unused, record in heapq.merge(*runs, key=lambda item: item[:2]):
+            yield load_feature(defn, record, feature)
+
+        self.close()
+
+    def close(self):
+        """Release buffer and temporary files.
+        """
+        for fd in self._runs:
+            fd.close()
+        self._runs = []
+        self._buffer = []
@@ -0,0 +1,199 @@
+###############################################################################
+#
+# VFR importer based on GDAL library
+#
+# Author: Martin Landa <landa.martin gmail.com>
+#
+# Licence: MIT/X
+#
+###############################################################################
+
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from osgeo import ogr, osr
+except ImportError as e:
+    sys.exit('ERROR: Import of ogr from osgeo failed. %s' % e)
+
+from .exception import VfrError
+from .logger import VfrLogger
+
+# number of features transformed at once (split between jobs)
+BATCH_SIZE = 1000
+
+def round_geometry(geom, digits):
+    """Round coordinates of geometry in place (used when
+    OGRGeometry::SetPrecision() is not available).
+
+    @param geom: geometry instance
+    @param digits: number of decimal places
+    """
+    ngeoms = geom.GetGeometryCount()
+    if ngeoms > 0:
+        for i in range(ngeoms):
+            round_geometry(geom.GetGeometryRef(i), digits)
+        return
+
+    for i in range(geom.GetPointCount()):
+        x, y, z = geom.GetPoint(i)
+        if geom.GetCoordinateDimension() > 2:
+            geom.SetPoint(i, round(x, digits), round(y, digits), z)
+        else:
+            geom.SetPoint_2D(i, round(x, digits), round(y, digits))
+
+def parse_srs(definition):
+    """Create spatial reference system from user input.
+
+    Raise VfrError on error.
+
+    @param definition: SRS definition (eg. EPSG:4326, WKT or PROJ string)
+
+    @return spatial reference instance
+    """
+    srs = osr.SpatialReference()
+    try:
+        if srs.SetFromUserInput(definition) != 0:
+            raise VfrError("Invalid SRS '%s'" % definition)
+    except RuntimeError as e:
+        raise VfrError("Invalid SRS '%s': %s" % (definition, e))
+    if hasattr(srs, 'SetAxisMappingStrategy'): # GDAL >= 3
+        srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+
+    return srs
+
+class GeometryTransform:
+    def __init__(self, simplify=None, precision=None, t_srs=None, jobs=1,
+                 batch_size=BATCH_SIZE):
+        """Transform geometries of output features (simplification,
+        reprojection, reduction of coordinate precision), eg. for
+        web-serving outputs.
+
+        Features are transformed in batches, geometries of one batch
+        are processed in parallel (GDAL releases GIL).
+
+        Coordinate transformations are created once per source SRS
+        and thread and cached for the whole run.
+
+        @param simplify: tolerance of simplification in source map units
+        (topology is preserved, None for no simplification)
+        @param precision: number of decimal places of coordinates
+        in target SRS (None to keep precision)
+        @param t_srs: target spatial reference (None for no reprojection)
+        @param jobs: number of parallel jobs
+        @param batch_size: number of features transformed at once
+        """
+        self._simplify = simplify
+        self._precision = precision
+        self._t_srs = t_srs
+        self._s_srs = None
+        self._s_key = None
+        self._local = threading.local()
+        self._jobs = max(1, jobs)
+        self.batch_size = batch_size if self._jobs > 1 else 1
+        self._pool = None
+
+    def __del__(self):
+        self.close()
+
+    def close(self):
+        """Shut down worker pool.
+        """
+        if self._pool:
+            self._pool.shutdown()
+            self._pool = None
+
+    def set_source_srs(self, srs):
+        """Set spatial reference of transformed geometries (eg. for
+        each input layer).
+
+        @param srs: source spatial reference
+        """
+        if not self._t_srs:
+            return
+        if srs is None:
+            raise VfrError("Unable to reproject geometries, unknown source SRS")
+        self._s_srs = srs.Clone()
+        if hasattr(self._s_srs, 'SetAxisMappingStrategy'): # GDAL >= 3
+            self._s_srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+        self._s_key = self._s_srs.ExportToWkt()
+
+    def _get_transformation(self):
+        """Get coordinate transformation from source SRS (see
+        set_source_srs()) to target SRS.
+
+        Transformations are not thread-safe, they are cached per
+        thread.
+
+        @return coordinate transformation instance
+        """
+        if not hasattr(self._local, 'cache'):
+            self._local.cache = {}
+        ct = self._local.cache.get(self._s_key)
+        if ct is None:
+            ct = osr.CoordinateTransformation(self._s_srs, self._t_srs)
+            if ct is None:
+                raise VfrError("Unable to create coordinate transformation")
+            self._local.cache[self._s_key] = ct
+
+        return ct
+
+    def transform_geometry(self, geom):
+        """Transform single geometry.
+
+        @param geom: geometry instance
+
+        @return transformed geometry (new instance or geom modified in place)
+        """
+        if self._simplify:
+            simplified = geom.SimplifyPreserveTopology(self._simplify)
+            if simplified is None:
+                VfrLogger.warning("Unable to simplify geometry, original geometry kept")
+            else:
+                geom = simplified
+        if self._t_srs and geom is not None:
+            # all vertices of geometry are transformed at once
+            if geom.Transform(self._get_transformation()) != 0:
+                raise VfrError("Unable to reproject geometry")
+        if self._precision is not None and geom is not None:
+            if hasattr(geom, 'SetPrecision'): # GDAL >= 3.9
+                reduced = geom.SetPrecision(10 ** -self._precision)
+                if reduced is None or (reduced.IsEmpty() and not geom.IsEmpty()):
+                    # geometry collapsed at given precision
+                    VfrLogger.warning("Geometry collapsed at precision %d, "
+                                      "coordinates kept" % self._precision)
+                else:
+                    geom = reduced
+            else:
+                round_geometry(geom, self._precision)
+
+        return geom
+
+    def _transform_features(self, features):
+        for feature in features:
+            for i in range(feature.GetGeomFieldCount()):
+                geom = feature.GetGeomFieldRef(i)
+                if geom is None:
+                    continue
+                tgeom = self.transform_geometry(geom)
+                if tgeom is not geom:
+                    # new geometry, no need to copy it
+                    feature.SetGeomFieldDirectly(i, tgeom)
+
+    def run(self, features):
+        """Transform geometries of features in place.
+
+        @param features: list of features
+        """
+        njobs = min(self._jobs, len(features))
+        if njobs < 2:
+            self._transform_features(features)
+            return
+
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(self._jobs)
+        size = (len(features) + njobs - 1) // njobs
+        chunks = [features[i:i + size] for i in range(0, len(features), size)]
+        for result in self._pool.map(self._transform_features, chunks):
+            pass # re-raise exceptions
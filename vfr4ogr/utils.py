@@ -12,13 +12,6 @@ import os
 import sys
 import datetime
 import mimetypes
-from xml.dom.minidom import parseString  # nosec B408
-
-
-try:
-    from osgeo import gdal, ogr
-except ImportError as e:
-    sys.exit('ERROR: Import of ogr from osgeo failed. %s' % e)
 
 from .exception import VfrError
 from .logger import VfrLogger
@@ -26,6 +19,11 @@ from .logger import VfrLogger
 def list_formats():
     """List supported OGR formats (write access).
     """
+    try:
+        from osgeo import ogr
+    except ImportError as e:
+        sys.exit('ERROR: Import of ogr from osgeo failed. %s' % e)
+
     cnt = ogr.GetDriverCount()
     
     formatsList = [] 
@@ -82,7 +80,7 @@ def parse_xml(filename):
     @return list of items
     """
     VfrLogger.msg("Comparing OGR layers and input XML file (may take some time)...", header=True)
-    if date > datetime.date(2018, 12, 7):
+    if filename.endswith('.zip'):
         from zipfile import ZipFile
         with ZipFile(filename) as zipfile:
             item = os.path.splitext(os.path.basename(filename))[0]
@@ -94,6 +92,7 @@ def parse_xml(filename):
             content = fd.read()
 
     # parse xml file content
+    from xml.dom.minidom import parseString  # nosec B408
     dom = parseString(content) # nosec B318
     data = dom.getElementsByTagName('vf:Data')[0]
     if data is None:
@@ -175,6 +174,21 @@ def get_date_interval(date):
     
     return dlist
 
+def peak_rss():
+    """Get peak resident set size of the process.
+
+    @return size in MB or None if not available (MS Windows)
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        return rss / (1024. * 1024.) # bytes
+    return rss / 1024. # kilobytes
+
 def extension():
     """Return valid file extension"""
     return 'zip' if datetime.date.today() > datetime.date(2018, 12, 7) else 'gz'
@@ -10,19 +10,15 @@
 
 import os
 import sys
-import mimetypes
 import time
 import datetime
 import copy
 import logging
 import re
-try:
-    # Python 2
-    from urllib2 import urlopen, HTTPError
-except ImportError:
-    # Python 3
-    from urllib.request import urlopen, HTTPError
-import getpass
+import hashlib
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from time import gmtime, strftime
 
 try:
@@ -33,7 +29,13 @@ except ImportError as e:
 
 from .exception import VfrError
 from .logger import VfrLogger
-from .utils import last_day_of_month, yesterday, parse_xml, extension
+from .utils import last_day_of_month, yesterday, parse_xml, compare_list, extension, \
+    get_date_interval, peak_rss
+from .sort import SpatialSorter
+from .changes import ChangeMap, ChangeBudget, max_changes
+from .archive import Archive
+from .fanout import OutputWriter
+from .transform import GeometryTransform, parse_srs
 
 class Mode:
     """File open mode.
@@ -48,10 +50,88 @@ class Action:
     add    = 0
     update = 1
     delete = 2
+    skip   = 3 # feature not modified (same content hash)
+
+# name of column with content hash of features
+HASH_COLUMN = 'vfr_hash'
+
+# GDAL error handler is installed once per process (see _check_ogr())
+_error_handler_installed = False
+
+# GML_GFS_TEMPLATE config option is process-wide, it's set only while
+# input datasource is opened (see _open_input())
+_gfs_lock = threading.Lock()
+
+# name of control table with state of applied changes (service mode)
+STATE_LAYER = 'vfr_state'
+
+# name of control table with number of features per layer
+STATS_LAYER = 'vfr_stats'
+
+# name of control table with number of committed input features per
+# layer (used to resume interrupted import)
+RESUME_LAYER = 'vfr_resume'
+
+# control tables (not exported, not indexed)
+CONTROL_LAYERS = (STATE_LAYER, STATS_LAYER, RESUME_LAYER)
+
+# drivers where stats and resume tables are written (other drivers
+# create files per layer or support only one layer)
+CONTROL_DRIVERS = ('PostgreSQL', 'SQLite', 'GPKG')
+
+# default number of features per transaction (see commit_every),
+# other drivers commit once per layer
+COMMIT_EVERY = {
+    'PostgreSQL' : 100000,
+    'SQLite' : 100000,
+    'GPKG' : 100000,
+}
+
+# layer codes used by deleted features (ZaniklePrvky)
+LCODE2LNAME = {
+    'ST' : 'Staty',
+    'RS' : 'RegionySoudrznosti',
+    'KR' : 'Kraje',
+    'VC' : 'Vusc',
+    'OK' : 'Okresy',
+    'OP' : 'Orp',
+    'PU' : 'Pou',
+    'OB' : 'Obce',
+    'SP' : 'SpravniObvody',
+    'MP' : 'Mop',
+    'MC' : 'Momc',
+    'CO' : 'CastiObci',
+    'KU' : 'KatastralniUzemi',
+    'ZJ' : 'Zsj',
+    'UL' : 'Ulice',
+    'PA' : 'Parcely',
+    'SO' : 'StavebniObjekty',
+    'AD' : 'AdresniMista',
+}
+
+# filter by municipality code (--obec): layer -> (column, layer with
+# codes referenced by column or None for municipality codes), upper
+# administrative units are not filtered
+OBEC_FILTER = {
+    'Obce' : ('Kod', None),
+    'CastiObci' : ('ObecKod', None),
+    'Mop' : ('ObecKod', None),
+    'SpravniObvody' : ('ObecKod', None),
+    'Momc' : ('ObecKod', None),
+    'KatastralniUzemi' : ('ObecKod', None),
+    'Ulice' : ('ObecKod', None),
+    'Zsj' : ('KatastralniUzemiKod', 'KatastralniUzemi'),
+    'Parcely' : ('KatastralniUzemiKod', 'KatastralniUzemi'),
+    'StavebniObjekty' : ('CastObceKod', 'CastiObci'),
+    'AdresniMista' : ('StavebniObjektKod', 'StavebniObjekty'),
+}
 
 class VfrOgr:
     def __init__(self, frmt, dsn, geom_name=None, layers=[], nogeomskip=False,
-                 overwrite=False, lco_options=[]):
+                 overwrite=False, lco_options=[], spatial_sort=False,
+                 content_hash=False, bbox=None, clip_geom=None, obec=None,
+                 columns=None, max_memory=None, jobs=1, report=None, outputs=[],
+                 commit_every=None, simplify=None, precision=None, t_srs=None):
         """Class for importing VFK data into selected format using GDAL library.
 
         Raise VfrError on error.
@@ -63,6 +143,27 @@ class VfrOgr:
         @param nogeomskip: True to skip features without geometry
         @param overwrite: True to overwrite existing files
         @param lco_options: list of layer creation options (see GDAL library for details
+        @param spatial_sort: True to write features sorted by Hilbert curve
+        @param content_hash: True to store content hash of features (used
+        to skip unchanged features when applying changes)
+        @param bbox: read only features in bounding box (xmin, ymin, xmax, ymax)
+        @param clip_geom: read only features intersecting geometry (WKT or
+        OGR datasource)
+        @param obec: read only features of given municipalities (list of codes)
+        @param columns: import only selected columns, dictionary where keys
+        are layer names and items lists of attributes and geometries
+        @param max_memory: memory budget for lists of changes in MB, changes
+        exceeding budget are moved to disk (None for unlimited)
+        @param jobs: number of parallel jobs
+        @param report: JSON file where to write extended statistics
+        @param outputs: additional output datasources written from the
+        same read pass, list of dictionaries with keys 'format', 'dsn'
+        and optionally 'lco' (list of layer creation options)
+        @param commit_every: number of features per transaction (0 for
+        one transaction per layer, None for driver default)
+        @param simplify: simplify geometries with given tolerance in map units
+        @param precision: round coordinates to given number of decimal places
+        @param t_srs: reproject geometries to given SRS (eg. EPSG:4326)
         """
         # check for required GDAL version
         self._check_ogr()
@@ -86,23 +187,64 @@ class VfrOgr:
             self._logFile = os.path.join(self._conf['LOG_DIR'], self._logFile)
             if not self._logFile.endswith('.log'):
                 self._logFile += '.log'
-            VfrLogger.addHandler(logging.FileHandler(self._logFile, delay = True))
-            VfrLogger.debug("log: {}".format(self._logFile))
+            if not any(isinstance(h, logging.FileHandler) for h in VfrLogger.handlers):
+                # one log file per process (see also outputs)
+                VfrLogger.addHandler(logging.FileHandler(self._logFile, delay = True))
+                VfrLogger.debug("log: {}".format(self._logFile))
         
         self.frmt = frmt
+        self._commit_every = commit_every if commit_every is not None else \
+                             COMMIT_EVERY.get(frmt, 0)
         self._geom_name = geom_name
         self._overwrite = overwrite
         self._layer_list = layers
         self._nogeomskip = nogeomskip
         self._lco_options = lco_options
+        self._spatial_sort = spatial_sort
+        self._content_hash = content_hash
+        self._bbox = bbox
+        self._clip_geom = self._read_geom(clip_geom) if clip_geom else None
+        self._obec = obec
+        self._obec_codes = {}
+        self._columns = columns if columns else {}
+        self._change_budget = ChangeBudget(max_changes(max_memory))
+        self._n_duplicated = 0
+        self._jobs = max(1, jobs)
+        self._report = report
+        self._report_data = {}
+        self._gfs_template = None
+        self._change_hashes = {} # see _process_changes()
+        self._t_srs = parse_srs(t_srs) if t_srs else None
+        if simplify or precision is not None or self._t_srs:
+            self._transform = GeometryTransform(simplify, precision, self._t_srs,
+                                                jobs=self._jobs)
+        else:
+            self._transform = None
+        self._downloader = None # see _get_downloader()
+        self._catalogue = None  # see _get_catalogue()
+        self._archive = Archive(self._conf['DATA_DIR'],
+                                max_age=self._conf_int('ARCHIVE_MAX_AGE'),
+                                max_count=self._conf_int('ARCHIVE_MAX_COUNT'),
+                                max_size=self._conf_int('ARCHIVE_MAX_SIZE'))
         
         self._file_list = []
+        self.failed = [] # files failed in last run (see run())
         
         # input datasource
         self._idrv = ogr.GetDriverByName("GML")
         if self._idrv is None:
             raise VfrError("Unable to select GML driver")
         self._ids = None
+
+        # additional outputs (fan-out), written by own threads
+        self._outputs = []
+        for output in outputs:
+            self._outputs.append(VfrOgr(frmt=output['format'], dsn=output['dsn'],
+                                        geom_name=geom_name, layers=layers,
+                                        nogeomskip=nogeomskip, overwrite=overwrite,
+                                        lco_options=list(output.get('lco', [])),
+                                        content_hash=content_hash, columns=columns,
+                                        commit_every=commit_every, t_srs=t_srs))
         
         # check output datasource
         self.odsn = dsn
@@ -143,9 +285,32 @@ class VfrOgr:
             self._lco_options.append("ENCODING=UTF-8")
 
     def __del__(self):
+        try:
+            self.close()
+        except AttributeError:
+            pass # not fully initialized
+
+    def close(self):
+        """Close input and output datasources (including additional
+        outputs) and release resources (see also vfrworker).
+
+        Convertor cannot be used after closing.
+        """
+        for output in self._outputs:
+            output.close()
+        self._outputs = []
+        self._ids = None
         if self._ods:
             # close output datasource
             self._ods.Close()
+            self._ods = None
+        if self._transform:
+            self._transform.close()
+        if self._downloader:
+            self._downloader.close()
+        if self._gfs_template and os.path.exists(self._gfs_template):
+            os.remove(self._gfs_template)
+        self._gfs_template = ''
 
     def _check_ogr(self):
         """Check GDAL/OGR library, version >= 1.11 required.
@@ -160,9 +325,15 @@ class VfrOgr:
         if not ogr.GetDriverByName('GML'):
             raise VfrError('GML driver required')
         
-        gdal.PushErrorHandler(self._error_handler)
-
-    def _error_handler(self, err_level, err_no, err_msg):
+        # handler doesn't refer to convertor (convertors are not kept
+        # alive by GDAL, handler stack doesn't grow)
+        global _error_handler_installed
+        if not _error_handler_installed:
+            gdal.PushErrorHandler(VfrOgr._error_handler)
+            _error_handler_installed = True
+
+    @staticmethod
+    def _error_handler(err_level, err_no, err_msg):
         """Redirect warnings produced by GDAL library to the file.
 
         @param err_level: error level to be redirected
@@ -176,6 +347,37 @@ class VfrOgr:
         else:
             VfrLogger.warning(err_msg)
 
+    def _read_geom(self, source):
+        """Read geometry used as spatial filter.
+
+        Raise VfrError on failure.
+
+        @param source: geometry as WKT or OGR datasource (union of
+        all its features is used)
+
+        @return geometry instance
+        """
+        if not os.path.exists(source):
+            geom = ogr.CreateGeometryFromWkt(source)
+            if geom is None:
+                raise VfrError("Invalid geometry '%s'" % source)
+            return geom
+
+        ds = ogr.Open(source)
+        if ds is None:
+            raise VfrError("Unable to open '%s'" % source)
+        geom = None
+        for i in range(ds.GetLayerCount()):
+            for feature in ds.GetLayer(i):
+                fgeom = feature.GetGeometryRef()
+                if fgeom is None:
+                    continue
+                geom = fgeom.Clone() if geom is None else geom.Union(fgeom)
+        if geom is None:
+            raise VfrError("No geometry found in '%s'" % source)
+
+        return geom
+
     def _read_conf(self):
         """Read configuration from file.
 
@@ -187,7 +389,14 @@ class VfrOgr:
 
         # set default values
         conf = { 'LOG_DIR' : '.',
-                 'DATA_DIR' : 'data' }
+                 'DATA_DIR' : 'data',
+                 'SORT_BUFFER' : '100000',
+                 'BASE_URL' : 'https://vdp.cuzk.cz/vymenny_format/',
+                 'ARCHIVE_MAX_AGE' : '',
+                 'ARCHIVE_MAX_COUNT' : '',
+                 'ARCHIVE_MAX_SIZE' : '',
+                 'CATALOGUE_URL' : '',
+                 'CATALOGUE_TTL' : '24' }
 
         # read configuration from file
         with open(cfile) as f:
@@ -209,6 +418,12 @@ class VfrOgr:
             conf['DATA_DIR'] = os.environ['DATA_DIR']
         if 'LOG_DIR' in os.environ:
             conf['LOG_DIR'] = os.environ['LOG_DIR']
+        if 'BASE_URL' in os.environ:
+            conf['BASE_URL'] = os.environ['BASE_URL']
+        if 'CATALOGUE_URL' in os.environ:
+            conf['CATALOGUE_URL'] = os.environ['CATALOGUE_URL']
+        if not conf['BASE_URL'].endswith('/'):
+            conf['BASE_URL'] += '/'
         
         # create data directory if not exists
         if not os.path.isabs(conf['DATA_DIR']):
@@ -221,70 +436,136 @@ class VfrOgr:
         
         return conf
 
+    def _conf_int(self, key):
+        """Get integer value from configuration.
+
+        Raise VfrError on invalid value.
+
+        @param key: configuration key
+
+        @return value or None if not defined
+        """
+        value = self._conf.get(key)
+        if not value:
+            return None
+        try:
+            return int(value)
+        except ValueError:
+            raise VfrError("Invalid value of {} in configuration: {}".format(key, value))
+
+    def _get_downloader(self):
+        """Get downloader (created on demand, HTTP client is not
+        loaded when only local files are processed).
+
+        @return Downloader instance
+        """
+        if self._downloader is None:
+            from .download import Downloader
+            self._downloader = Downloader(jobs=self._jobs)
+
+        return self._downloader
+
+    def _get_catalogue(self):
+        """Get local catalogue of published files (created on demand).
+
+        @return Catalogue instance or None if disabled (see CATALOGUE_URL)
+        """
+        if self._catalogue is None and self._conf['CATALOGUE_URL'] != 'none':
+            from .catalogue import Catalogue
+            sources = self._conf['CATALOGUE_URL'].split(',') if self._conf['CATALOGUE_URL'] else \
+                      [self._conf['BASE_URL'] + 'soucasna/']
+            self._catalogue = Catalogue(self._conf['DATA_DIR'], sources,
+                                        ttl=self._conf_int('CATALOGUE_TTL') or 0,
+                                        downloader=self._get_downloader())
+
+        return self._catalogue
+
+    def _published(self, url):
+        """Check in local catalogue if VFR file is published.
+
+        @param url: URL of VFR file
+
+        @return True or False, None if not known (no catalogue available)
+        """
+        catalogue = self._get_catalogue()
+        if not catalogue or not catalogue.covers(url) or not catalogue.available():
+            return None
+
+        return url in catalogue
+
     def _download_vfr(self, url):
         """Downloading VFR file to selected directory.
 
         Raise VfrError on error.
 
         @param url: URL where file can be downloaded
+
+        @return path to local file
         """
-        def download_file(self, url, local_file):
-            success = True
-            with open(local_file, 'wb') as fd:
-                try:
-                    with urlopen(url) as response: # nosec B310
-                        fd.write(response.read())
-                except HTTPError as e:
-                    if e.code == 404:
-                        success = False
-
-            if not success:
-                os.remove(local_file)
-                raise VfrError("File '%s' not found" % url)
-            
         if os.path.exists(url): # single VFR file
             return url
 
         local_file = os.path.join(self._conf['DATA_DIR'], os.path.basename(url))
         VfrLogger.debug('download_vfr(): local_file={}'.format(local_file))
-        if os.path.exists(local_file): # don't download file if found
+        if self._archive.get(local_file): # don't download file if found (and valid)
             return local_file
 
         VfrLogger.msg("Downloading {} ({})...".format(url, self._conf['DATA_DIR']),
                       header=True)
 
-        if not url.startswith('https://'):
-            url = 'https://vdp.cuzk.cz/vymenny_format/soucasna/' + url
+        if not url.startswith('https://') and not url.startswith('http://'):
+            url = self._conf['BASE_URL'] + 'soucasna/' + url
 
         # try more dates when downloading ST_U data (CUZK is
         # publishing data last day in the month, but there can be
-        # exceptions due to technical reasons)
+        # exceptions due to technical reasons), candidates are probed
+        # concurrently
         ndays = 0 if 'ST_Z' in url else 3
-        old_date = last_day_of_month(string=False)
-        for day in range(1, ndays+2):
-            try:
-                download_file(self, url, local_file)
-            except VfrError as e:
-                new_date = old_date + datetime.timedelta(days=1)
-                url = url.replace(
-                    old_date.strftime("%Y%m%d"), new_date.strftime("%Y%m%d")
-                )
-                local_file = local_file.replace(
-                    old_date.strftime("%Y%m%d"), new_date.strftime("%Y%m%d")
-                )
-                if day < ndays:
-                    VfrLogger.error('{}'.format(e))
-                    VfrLogger.info("New attempt: '{}'...{}".format(url, os.linesep))
-                else:
-                    raise VfrError('{}'.format(e))
+        old_date = last_day_of_month(string=False).strftime("%Y%m%d")
+        candidates = [url]
+        for day in range(1, ndays+1):
+            new_date = (last_day_of_month(string=False) + \
+                        datetime.timedelta(days=day)).strftime("%Y%m%d")
+            new_url = url.replace(old_date, new_date)
+            if new_url not in candidates:
+                candidates.append(new_url)
+
+        for candidate in candidates[1:]:
+            candidate_file = self._archive.get(os.path.basename(candidate))
+            if candidate_file:
+                return candidate_file
+
+        if self._published(url) is not None:
+            # resolved by local catalogue, no probes needed (server is
+            # probed when catalogue doesn't list any candidate, eg. it
+            # cannot be refreshed)
+            published = [c for c in candidates if self._published(c)]
+            if published:
+                candidates = published
+            else:
+                VfrLogger.debug("File '%s' not found in catalogue, probing server" % url)
+
+        if len(candidates) > 1:
+            found = self._get_downloader().probe(candidates)
+        else:
+            found = candidates[0]
+        if not found:
+            raise VfrError("File '%s' not found" % url)
+        if found != url:
+            VfrLogger.info("Using '{}' instead of '{}'".format(found, url))
+            local_file = os.path.join(self._conf['DATA_DIR'], os.path.basename(found))
+            url = found
+
+        self._get_downloader().fetch(url, local_file)
 
-        return local_file
+        return self._archive.add(local_file)
 
     def cmd_log(self, cmd):
         """Return cmd log file
 
         @return string
         """
+        import getpass
         VfrLogger.msg('cmd={}\npid={}\nuser={}\ndate={}\ncwd={}\ndata={}\nlog={}'.format(' '.join(sys.argv),
                                                                                          os.getpid(),
                                                                                          getpass.getuser(),
@@ -293,12 +574,16 @@ class VfrOgr:
                       header=True, style='#')
 
     def reset(self):
-        """Reset file list"""
+        """Reset file list and statistics (see also vfrworker)"""
         self._file_list = []
+        self._report_data = {}
 
     def download(self, file_list, force_date=None):
         """Download VFR files.
 
+        Raise VfrError if some files cannot be downloaded (files
+        downloaded successfully are kept in the file list).
+
         @param file_list: file list to be processed
         @param force_date: force date if not defined
         
@@ -306,23 +591,26 @@ class VfrOgr:
         """
         VfrLogger.msg("%d VFR file(s) will be processed..." % len(file_list), header=True)
         
-        base_url = "https://vdp.cuzk.cz/vymenny_format/"
+        base_url = self._conf['BASE_URL']
+        url_list = []
         for line in file_list:
             if not os.path.isabs(line):
                 file_path = os.path.abspath(os.path.join(self._conf['DATA_DIR'], line))
             else:
                 file_path = line
             if os.path.exists(file_path):
+                import mimetypes
                 ftype, fencoding =  mimetypes.guess_type(file_path)
                 if ((ftype in ('application/xml', 'text/xml') and fencoding == 'gzip') or \
                     (ftype in ('application/zip', 'application/x-zip-compressed') and fencoding is None)):
                     # downloaded VFR file, skip
-                    self._file_list.append(file_path)
+                    url_list.append(file_path)
                 else:
                     VfrLogger.warning("File <{}>: unsupported minetype '{}'".format(line, ftype))
             else:
                 if not line.startswith('https://') and \
-                        not line.startswith('20'):
+                   not line.startswith('http://') and \
+                   not line.startswith('20'):
                     # determine date if missing
                     if not force_date:
                         if line.startswith('ST_Z'):
@@ -340,7 +628,7 @@ class VfrOgr:
                         datetime.datetime.strptime(reg.group(2), "%Y%m%d")
                     )
 
-                if not line.startswith('https'):
+                if not line.startswith('http'):
                     # add base url if missing
                     base_url_line = base_url
                     if 'ST_UVOH' not in line:
@@ -356,7 +644,50 @@ class VfrOgr:
                     # add extension if missing
                     line += ext
 
-                self._file_list.append(self._download_vfr(line))
+                if 'ST_Z' in line and len(file_list) > 1 and \
+                   self._published(line) is False and \
+                   not self._archive.get(os.path.basename(line), verify=False):
+                    # date interval is mapped only to published files
+                    VfrLogger.warning("File <{}> not published, skipped".format(line))
+                    continue
+
+                url_list.append(line)
+
+        # files are downloaded in parallel (see --jobs), order is
+        # kept, files which failed are reported together at the end
+        metrics = []
+        errors = []
+        if all(os.path.exists(url) for url in url_list):
+            self._file_list += url_list # local files only
+        else:
+            def download_vfr(url):
+                try:
+                    return self._download_vfr(url), None
+                except VfrError as e:
+                    return None, e
+
+            downloader = self._get_downloader()
+            nmetrics = len(downloader.metrics)
+            for local_file, error in downloader.map(download_vfr, url_list):
+                if error:
+                    errors.append(str(error))
+                else:
+                    self._file_list.append(local_file)
+            metrics = downloader.metrics[nmetrics:]
+        if metrics:
+            size = sum(m['size'] for m in metrics) / (1024. * 1024.)
+            VfrLogger.msg("%d file(s) downloaded (%.1f MB, %.2f MB/s per file)" % \
+                          (len(metrics), size,
+                           sum(m['bandwidth'] or 0 for m in metrics) / len(metrics)),
+                          header=True)
+            self._report_data.setdefault('downloads', []).extend(metrics)
+
+        # apply retention limits of local archive
+        self._archive.cleanup(keep=self._file_list)
+
+        if errors:
+            raise VfrError("Unable to download %d file(s):\n%s" % \
+                           (len(errors), '\n'.join(errors)))
                
     def print_summary(self):
         """Print summary for multiple file input.
@@ -369,14 +700,20 @@ class VfrOgr:
             for idx in range(self._ods.GetLayerCount()):
                 layer_list.append(self._ods.GetLayer(idx).GetName())
         
+        stats = self._read_stats()
         VfrLogger.msg("Summary", header=True)
         for layer_name in layer_list:
+            if layer_name in CONTROL_LAYERS:
+                continue # skip control tables
             layer = self._ods.GetLayerByName(layer_name)
             if not layer:
                 continue
 
+            count = self._estimate_feature_count(layer)
+            if count is None:
+                count = self._get_feature_count(layer, stats)
             VfrLogger.msg("Layer            %-20s ... %10d features\n" % \
-                             (layer_name, layer.GetFeatureCount()))
+                             (layer_name, count))
         
         nsec = time.time() - stime    
         etime = str(datetime.timedelta(seconds=nsec))
@@ -392,12 +729,91 @@ class VfrOgr:
         @return datasource instance
         """
         vsi = '/vsizip/' if extension() == 'zip' else '/vsigzip/'
-        self._ids = self._idrv.Open(vsi + filename, False)
+        self._ids_name = vsi + filename
+        self._ids = self._open_input(self._ids_name)
         if self._ids is None:
             raise VfrError("Unable to open file '%s'. Skipping.\n" % filename)
 
         return self._ids
+
+    def _open_input(self, name):
+        """Open input datasource by GML driver.
+
+        GFS template (see _get_gfs_template()) is applied only to this
+        datasource, config option is restored afterwards.
+
+        @param name: datasource name
+
+        @return datasource instance or None on failure
+        """
+        template = self._get_gfs_template()
+        if not template:
+            return self._idrv.Open(name, False)
+
+        with _gfs_lock:
+            # only selected feature classes are read by GML driver
+            previous = gdal.GetConfigOption('GML_GFS_TEMPLATE')
+            gdal.SetConfigOption('GML_GFS_TEMPLATE', template)
+            try:
+                return self._idrv.Open(name, False)
+            finally:
+                gdal.SetConfigOption('GML_GFS_TEMPLATE', previous)
     
+    def _get_gfs_template(self):
+        """Get GFS template trimmed to selected layers and columns.
+
+        Besides selected layers also layers required for processing
+        (deleted features, parent layers of municipality filter) are
+        kept. Template is created only once per run.
+
+        @return GFS file name or None if all layers and columns are read
+        """
+        if not self._layer_list and not self._columns:
+            return None
+
+        if self._gfs_template is None:
+            import tempfile
+            from .gfs import GFS_DIR, read_gfs, trim_gfs, write_gfs
+            root = None
+            for name in ('ruian_vf_v1.gfs', 'ruian_vf_st_uvoh_v1.gfs'):
+                source = os.path.join(GFS_DIR, name)
+                if not os.path.isfile(source):
+                    VfrLogger.warning("GFS file '%s' not found, all layers "
+                                      "will be read" % source)
+                    self._gfs_template = ''
+                    return None
+                if root is None:
+                    root = read_gfs(source)
+                else:
+                    root.extend(read_gfs(source))
+
+            layers = list(self._layer_list) if self._layer_list else None
+            columns = copy.deepcopy(self._columns)
+            if layers:
+                layers.append('ZaniklePrvky')
+            if self._obec:
+                # keep columns and layers used by municipality filter
+                for layer_name in list(layers if layers else OBEC_FILTER.keys()):
+                    while layer_name in OBEC_FILTER:
+                        column, source_layer = OBEC_FILTER[layer_name]
+                        if layer_name in columns and column not in columns[layer_name]:
+                            columns[layer_name].append(column)
+                        if not source_layer:
+                            break
+                        if layers and source_layer not in layers:
+                            layers.append(source_layer)
+                        # codes of source layer are read by _get_obec_codes()
+                        if source_layer in columns and 'Kod' not in columns[source_layer]:
+                            columns[source_layer].append('Kod')
+                        layer_name = source_layer
+
+            fd, self._gfs_template = tempfile.mkstemp(prefix='vfr_', suffix='.gfs')
+            os.close(fd)
+            write_gfs(trim_gfs(root, layers, columns), self._gfs_template)
+            VfrLogger.debug("GFS template: {}".format(self._gfs_template))
+
+        return self._gfs_template if self._gfs_template else None
+
     def _list_layers(self, extended = False, fd = sys.stdout):
         """List OGR layers of input VFR file.
 
@@ -409,26 +825,168 @@ class VfrOgr:
         nlayers = self._ids.GetLayerCount()
         layer_list = list()
         for i in range(nlayers):
-            layer = self._ids.GetLayer(i)
-            layerName = layer.GetName()
-            layer_list.append(layerName)
+            layer_list.append(self._ids.GetLayer(i).GetName())
 
+        if extended and fd:
+            # collect statistics in one pass per layer (in parallel if requested)
+            if self._jobs > 1:
+                with ThreadPoolExecutor(self._jobs) as pool:
+                    stats_list = list(pool.map(self._get_layer_stats_ds, layer_list))
+            else:
+                stats_list = [self._get_layer_stats(self._ids.GetLayer(i)) for i in range(nlayers)]
+            self._report_data[self._ids_name] = dict(zip(layer_list, stats_list))
+
+        for i in range(nlayers):
+            layerName = layer_list[i]
             if not fd:
                 continue
 
             if extended:
                 fd.write('-' * 80 + os.linesep)
-            featureCount = layer.GetFeatureCount()
+                stats = stats_list[i]
+                featureCount = stats['features']
+            else:
+                featureCount = self._ids.GetLayer(i).GetFeatureCount()
             fd.write("Number of features in %-20s: %d\n" % (layerName, featureCount))
             if extended:
-                for field, count in self._get_geom_count(layer):
-                    fd.write("%41s : %d\n" % (field, count))
+                for field, gstats in stats['geometries'].items():
+                    fd.write("%41s : %d (invalid: %d, vertices: %d)\n" % \
+                             (field, gstats['count'], gstats['invalid'], gstats['vertices']))
 
         if fd:
             fd.write('-' * 80 + os.linesep)
 
         return layer_list
 
+    def _get_obec_codes(self, layer_name):
+        """Get codes of features belonging to selected municipalities.
+
+        @param layer_name: name of input layer (see OBEC_FILTER)
+
+        @return list of codes or None if not available
+        """
+        if layer_name not in self._obec_codes:
+            where = self._get_obec_filter(layer_name)
+            layer = self._ids.GetLayerByName(layer_name)
+            if where is None or layer is None:
+                VfrLogger.warning("Layer '%s' not found, unable to filter by "
+                                  "municipality code" % layer_name)
+                return None
+            codes = []
+            layer.SetAttributeFilter(where)
+            for feature in layer:
+                codes.append(feature.GetField('Kod'))
+            layer.SetAttributeFilter(None)
+            self._obec_codes[layer_name] = codes
+
+        return self._obec_codes[layer_name]
+
+    def _get_obec_filter(self, layer_name):
+        """Get attribute filter for selected municipalities.
+
+        @param layer_name: name of input layer
+
+        @return where statement or None if layer is not filtered
+        """
+        if layer_name not in OBEC_FILTER:
+            return None
+
+        column, source = OBEC_FILTER[layer_name]
+        if source:
+            codes = self._get_obec_codes(source)
+            if codes is None:
+                return None
+        else:
+            codes = self._obec
+        if not codes:
+            codes = [-1] # nothing to read
+
+        return "%s IN (%s)" % (column, ','.join(map(str, codes)))
+
+    def _set_filter(self, layer, geom_name=None):
+        """Set spatial and attribute filter on input layer.
+
+        @param layer: input layer instance
+        @param geom_name: name of geometry column used by spatial filter
+        (None for first one)
+        """
+        defn = layer.GetLayerDefn()
+        if (self._bbox or self._clip_geom) and defn.GetGeomFieldCount() > 0:
+            idx = defn.GetGeomFieldIndex(geom_name) if geom_name else 0
+            if idx < 0:
+                idx = 0
+            if self._clip_geom:
+                geom = self._clip_geom
+                if self._bbox:
+                    geom = geom.Clone()
+                    xmin, ymin, xmax, ymax = self._bbox
+                    rect = ogr.CreateGeometryFromWkt(
+                        "POLYGON((%f %f,%f %f,%f %f,%f %f,%f %f))" % \
+                        (xmin, ymin, xmax, ymin, xmax, ymax, xmin, ymax, xmin, ymin))
+                    geom = geom.Intersection(rect)
+                layer.SetSpatialFilter(idx, geom)
+            else:
+                layer.SetSpatialFilterRect(idx, *self._bbox)
+
+        if self._obec:
+            where = self._get_obec_filter(layer.GetName())
+            if where:
+                layer.SetAttributeFilter(where)
+
+    def _set_ignored_fields(self, layer, geom_name=None, single_geom=False):
+        """Skip columns not requested by projection when reading input layer.
+
+        Key column (gml_id) and preferred geometry are always read. If
+        projection contains no geometry column, all geometries are read.
+        Layer and column names are compared case-insensitive (PostGIS
+        tables are lower case).
+
+        @param layer: input layer instance
+        @param geom_name: name of preferred geometry column
+        @param single_geom: True to skip also geometries which cannot be
+        written (only preferred geometry is written, see --geom)
+        """
+        layer_name = layer.GetName().split('.')[-1].lower()
+        columns = None
+        for name, cols in self._columns.items():
+            if name.lower() == layer_name:
+                columns = [c.lower() for c in cols]
+
+        keep = ['gml_id']
+        if geom_name:
+            keep.append(geom_name.lower())
+        if self._obec:
+            # columns used by municipality filter (see _get_obec_filter())
+            for name, (column, source) in OBEC_FILTER.items():
+                if name.lower() == layer_name:
+                    keep.append(column.lower())
+                if source and source.lower() == layer_name:
+                    keep.append('kod') # see _get_obec_codes()
+
+        defn = layer.GetLayerDefn()
+        ignored = []
+        if columns:
+            for i in range(defn.GetFieldCount()):
+                name = defn.GetFieldDefn(i).GetName()
+                if name.lower() not in columns and name.lower() not in keep:
+                    ignored.append(name)
+
+        geom_list = [defn.GetGeomFieldDefn(i).GetName() for i in range(defn.GetGeomFieldCount())]
+        if columns and any(name.lower() in columns for name in geom_list):
+            for name in geom_list:
+                if name.lower() not in columns and name.lower() not in keep:
+                    ignored.append(name)
+        elif single_geom and geom_name:
+            # fallback geometries are kept (see _modify_feature())
+            keep += [name.lower() for name in self._geom_name]
+            ignored += [name for name in geom_list if name.lower() not in keep]
+
+        if not ignored:
+            return
+
+        if layer.SetIgnoredFields(ignored) != 0:
+            VfrLogger.warning("Layer '%s': unable to ignore columns" % layer.GetName())
+
     def _convert_vfr(self, mode = Mode.write, schema=None):
         """Write features from input (VFR) datasource to output datasource
 
@@ -437,12 +995,22 @@ class VfrOgr:
 
         @return number of converted features
         """
+        if self._outputs and mode == Mode.change:
+            raise VfrError("Changes cannot be applied to more outputs at once")
+
         if self._overwrite and mode == Mode.write:
             # delete also layers which are not part of ST_UKSH (do it better?)
-            for layer in ("ulice", "parcely", "stavebniobjekty", "adresnimista"):
-                if self._ods.GetLayerByName(layer) is not None:
-                    self._ods.DeleteLayer(layer)
+            for output in [self] + self._outputs:
+                for layer in ("ulice", "parcely", "stavebniobjekty", "adresnimista"):
+                    if output._ods.GetLayerByName(layer) is not None:
+                        output._ods.DeleteLayer(layer)
         
+        # codes used by filter are valid only for current input file
+        self._obec_codes = {}
+
+        # number of features per output layer
+        stats = self._read_stats()
+
         # process features marked for deletion first
         dlist = None # statistics
         if mode == Mode.change:
@@ -476,16 +1044,7 @@ class VfrOgr:
                 continue
 
             # fix output drivers not to use default geometry names
-            if self.frmt in ('PostgreSQL', 'OCI') and not self._geom_name:
-                self._remove_option('GEOMETRY_NAME')
-                if layer_name_lower == 'ulice':
-                    geom_name = 'definicnicara'
-                elif layer_name_lower == 'adresnimista':
-                    geom_name = 'adresnibod'
-                else:
-                    geom_name = 'definicnibod'
-
-                self._lco_options.append('GEOMETRY_NAME={}'.format(geom_name))
+            self._set_geometry_name(layer_name_lower)
 
             # try to be clever if geometry column specified
             geom_name = self._geom_name[0] if self._geom_name is not None else None
@@ -505,6 +1064,11 @@ class VfrOgr:
                                 if 0 > feat_defn.GetGeomFieldIndex(geom_name):
                                     geom_name = None
 
+            # read only requested features
+            self._set_filter(layer, geom_name)
+            self._set_ignored_fields(layer, geom_name,
+                                     single_geom=not self._content_hash)
+
             # delete layer if exists and append is not True
             if olayer and mode == Mode.write:
                 if self._delete_layer(layer_name_lower):
@@ -516,9 +1080,17 @@ class VfrOgr:
             if olayer is None:
                 raise VfrError("Unable to export layer '%s'. Exiting..." % layer_name)
 
+            # number of features in output layer (counted incrementally)
+            if mode == Mode.write:
+                ncount = 0
+            else:
+                ncount = self._get_feature_count(olayer, stats)
+
             # pre-process changes
             if mode == Mode.change:
+                self._n_duplicated = 0
                 change_list = self._process_changes(layer, olayer)
+                ncount -= self._n_duplicated
                 if dlist and layer_name in dlist: # add features to be deleted
                     change_list.update(dlist[layer_name])
 
@@ -527,6 +1099,7 @@ class VfrOgr:
 
             # make sure that PG sequence is up-to-date (import for fid == -1)
             fid = -1
+            table_name = None
             if hasattr(self, "_conn"): # do it better?
                 if schema:
                     table_name = '%s.%s' % (schema, layer_name_lower)
@@ -537,94 +1110,265 @@ class VfrOgr:
                     self._update_fid_seq(table_name, fid)
             
             if fid is None or fid == -1:
-                fid = olayer.GetFeatureCount()
-
-            # start transaction in output layer
-            if olayer.TestCapability(ogr.OLCTransactions):
-                olayer.StartTransaction()
+                fid = ncount
 
-            # delete marked features first (changes only)
-            if mode == Mode.change and dlist and layer_name in dlist:
-                for fid in dlist[layer_name].keys():
-                    olayer.DeleteFeature(fid)
+            # additional outputs (see outputs), features are written
+            # by own threads (fids are kept when layers are created)
+            writers = []
+            try:
+                for output in self._outputs:
+                    output._set_geometry_name(layer_name_lower)
+                    oolayer = output._ods.GetLayerByName(layer_name_lower)
+                    if oolayer and mode == Mode.write:
+                        if not self._overwrite:
+                            VfrLogger.msg(" (%s: already exists)" % output.odsn)
+                            continue
+                        if output._delete_layer(layer_name_lower):
+                            oolayer = None
+                    if not oolayer:
+                        oolayer = output._create_layer(layer_name_lower, layer, geom_name)
+                    if oolayer is None:
+                        raise VfrError("Unable to export layer '%s' into '%s'. Exiting..." % \
+                                       (layer_name, output.odsn))
+                    writers.append(OutputWriter(output, oolayer, layer_name_lower,
+                                                keep_fid=mode == Mode.write,
+                                                ncount=0 if mode == Mode.write else \
+                                                output._get_feature_count(oolayer, output._read_stats()),
+                                                commit_every=output._commit_every))
+
+                # sort features by Hilbert curve before writing (not
+                # supported for changes, features are updated in place)
+                sorter = None
+                if self._spatial_sort and mode != Mode.change:
+                    sorter = SpatialSorter(int(self._conf['SORT_BUFFER']))
+                    fid_sort = fid
+
+                # commit features in batches (see commit_every), changes
+                # are always applied in one transaction
+                transaction = olayer.TestCapability(ogr.OLCTransactions)
+                commit_every = self._commit_every if transaction and mode != Mode.change else 0
+
+                # resume interrupted import of the same file (features
+                # already committed are skipped), not possible when
+                # features are sorted or written into more outputs
+                resume = commit_every and sorter is None and not self._outputs and \
+                         self.frmt in CONTROL_DRIVERS
+                nread = 0
+                if resume and mode == Mode.append:
+                    nread, completed = self._get_resume(layer_name_lower)
+                    if completed:
+                        # imported by interrupted run (more files)
+                        VfrLogger.msg(" already imported, skipped\n")
+                        continue
 
-            # do mapping for fields (needed for Esri Shapefile when
-            # field names are truncated)
-            field_map = [i for i in range(0, layer.GetLayerDefn().GetFieldCount())]
+                # control tables are created outside of transaction
+                if transaction:
+                    self._write_stats(layer_name_lower, ncount)
+                    if resume:
+                        self._set_resume(layer_name_lower, nread)
+
+                # start transaction in output layer
+                if transaction:
+                    olayer.StartTransaction()
+
+                # delete marked features first (changes only)
+                if mode == Mode.change and dlist and layer_name in dlist:
+                    for fid in dlist[layer_name].keys():
+                        if olayer.DeleteFeature(fid) == 0:
+                            ncount -= 1
+
+                # do mapping for fields by name (output layer may exist
+                # with other columns, see --append), ignored and missing
+                # fields are skipped
+                odefn = olayer.GetLayerDefn()
+                field_map = []
+                ofield_idx = 0
+                feat_defn = layer.GetLayerDefn()
+                for i in range(0, feat_defn.GetFieldCount()):
+                    if feat_defn.GetFieldDefn(i).IsIgnored():
+                        field_map.append(-1)
+                        continue
+                    name = feat_defn.GetFieldDefn(i).GetName()
+                    idx = odefn.GetFieldIndex(name)
+                    if idx < 0 and ofield_idx < odefn.GetFieldCount() and \
+                       odefn.GetFieldDefn(ofield_idx).GetName()[:8].lower() == name[:8].lower():
+                        # field name truncated by driver (Esri Shapefile)
+                        idx = ofield_idx
+                    field_map.append(idx)
+                    ofield_idx += 1
+
+                # content hash is stored only when output layer has such column
+                hash_idx = odefn.GetFieldIndex(HASH_COLUMN)
+
+                # input geometry already transferred to output feature by
+                # SetFromWithMap() (output with one geometry column gets
+                # geometry of the same name, otherwise the first one)
+                geom_src = -1
+                if geom_name and odefn.GetGeomFieldCount() == 1:
+                    geom_src = max(0, feat_defn.GetGeomFieldIndex(
+                        odefn.GetGeomFieldDefn(0).GetNameRef()))
+
+                # features waiting to be written (see _write_features())
+                batch = []
+                batch_size = self._transform.batch_size if self._transform else 1
+                nuncommitted = 0 # features written since last commit
+
+                # one output feature is reused when features are written
+                # immediately (sorter keeps only serialized features,
+                # additional outputs get copies)
+                reuse = batch_size == 1
+                ofeature_reused = ogr.Feature(odefn) if reuse else None
+                if self._transform:
+                    self._transform.set_source_srs(layer.GetSpatialRef())
+
+                # copy features from source to destination layer
+                layer.ResetReading()
+                if nread > 0:
+                    VfrLogger.msg(" resuming from feature %d..." % nread)
+                    layer.SetNextByIndex(nread)
+                    ifeat = nread
+                feature = layer.GetNextFeature()
+                while feature:
+                    nread += 1
+                    # check for changes first (delete/update/add)
+                    if mode == Mode.change:
+                        c_fid = feature.GetFID()
+                        action, o_fid = change_list.get(c_fid, (None, None))
+                        if action is None:
+                            raise VfrError("Layer %s: unable to find feature %d" % (layer_name, c_fid))
+
+                        # feature marked to be changed (delete first)
+                        if action in (Action.delete, Action.update):
+                            if olayer.DeleteFeature(o_fid) == 0:
+                                ncount -= 1
+
+                        # determine fid for new feature
+                        if action == Action.add:
+                            fid = -1
+                        else:
+                            fid = o_fid
 
-            # copy features from source to destination layer
-            layer.ResetReading()
-            feature = layer.GetNextFeature()
-            while feature:
-                # check for changes first (delete/update/add)
-                if mode == Mode.change:
-                    c_fid = feature.GetFID()
-                    action, o_fid = change_list.get(c_fid, (None, None))
-                    if action is None:
-                        raise VfrError("Layer %s: unable to find feature %d" % (layer_name, c_fid))
-
-                    # feature marked to be changed (delete first)
-                    if action in (Action.delete, Action.update):
-                        olayer.DeleteFeature(o_fid)
-
-                    # determine fid for new feature
-                    if action == Action.add:
-                        fid = -1
+                        if action in (Action.delete, Action.skip):
+                            # do nothing and continue
+                            feature = layer.GetNextFeature()
+                            ifeat += 1
+                            continue
                     else:
-                        fid = o_fid
-
-                    if action == Action.delete:
-                        # do nothing and continue
+                        fid += 1
+
+                    # content hash is computed from input feature before
+                    # its geometries are modified
+                    if hash_idx > -1:
+                        # hash of updated features is already computed
+                        fhash = self._change_hashes.pop(feature.GetFID(), None) \
+                                if mode == Mode.change else None
+                        fhash = fhash or self._get_hash(feature)
+
+                    # output geometry is taken from another input geometry
+                    # column (see _modify_feature()), SetFromWithMap()
+                    # must not copy geometry which is replaced anyway
+                    if geom_src > -1 and geom_idx > -1 and geom_idx != geom_src:
+                        feature.SetGeomFieldDirectly(geom_src, None)
+
+                    # fill output feature (all fields and geometries are
+                    # overwritten, FID is set below)
+                    ofeature = ofeature_reused if reuse else ogr.Feature(odefn)
+                    ofeature.SetFromWithMap(feature, True, field_map)
+                    if hash_idx > -1:
+                        ofeature.SetField(hash_idx, fhash)
+
+                    # modify geometry columns if requested
+                    if geom_name:
+                        geom_idx = self._modify_feature(feature, geom_idx, ofeature,
+                                                        geom_src=geom_src)
+
+                    if ofeature.GetGeometryRef() is None:
+                        n_nogeom += 1
+                        if self._nogeomskip:
+                            # skip feature without geometry
+                            feature = layer.GetNextFeature()
+                            if not reuse:
+                                ofeature.Destroy()
+                            continue
+
+                    if sorter is not None:
+                        # postpone writing until all features are sorted
+                        sorter.add(ofeature)
                         feature = layer.GetNextFeature()
                         ifeat += 1
                         continue
-                else:
-                    fid += 1
-
-                # clone feature
-                ofeature = ogr.Feature(olayer.GetLayerDefn())
-                ofeature.SetFromWithMap(feature, True, field_map)
 
-                # modify geometry columns if requested
-                if geom_name:
-                    geom_idx = self._modify_feature(feature, geom_idx, ofeature)
-
-                if ofeature.GetGeometryRef() is None:
-                    n_nogeom += 1
-                    if self._nogeomskip:
-                        # skip feature without geometry
-                        feature = layer.GetNextFeature()
-                        ofeature.Destroy()
-                        continue
+                    # set feature id
+                    if fid >= -1:
+                        # fid == -1 -> unknown fid
+                        ofeature.SetFID(fid)
+
+                    # add new feature to output layer (in batches when
+                    # geometries are transformed)
+                    batch.append(ofeature)
+                    nuncommitted += 1
+                    commit = commit_every and nuncommitted >= commit_every
+                    if len(batch) >= batch_size or commit:
+                        ncount += self._write_features(olayer, batch, writers)
+                        batch = []
+
+                    if commit:
+                        # skipped features are committed too (resume table)
+                        self._commit_batch(olayer, layer_name_lower, ncount,
+                                           nread if resume else None, table_name, fid)
+                        nuncommitted = 0
 
-                # set feature id
-                if fid >= -1:
-                    # fid == -1 -> unknown fid
-                    ofeature.SetFID(fid)
-
-                # add new feature to output layer
-                olayer.CreateFeature(ofeature)
-
-                feature = layer.GetNextFeature()
-                ifeat += 1
-
-            # commit transaction in output layer
-            if olayer.TestCapability(ogr.OLCTransactions):
-                olayer.CommitTransaction()
+                    feature = layer.GetNextFeature()
+                    ifeat += 1
+
+                if sorter is not None:
+                    # write features in spatial order, fids follow that order
+                    VfrLogger.msg(" sorting...")
+                    fid = fid_sort
+                    for ofeature in sorter.features(odefn, reuse):
+                        fid += 1
+                        ofeature.SetFID(fid)
+                        batch.append(ofeature)
+                        commit = commit_every and (fid - fid_sort) % commit_every == 0
+                        if len(batch) >= batch_size or commit:
+                            ncount += self._write_features(olayer, batch, writers)
+                            batch = []
+                        if commit:
+                            self._commit_batch(olayer, layer_name_lower, ncount,
+                                               table_name=table_name, fid=fid)
+
+                # write remaining features
+                if batch:
+                    ncount += self._write_features(olayer, batch, writers)
+
+                # store number of features (see print_summary()), layer
+                # is completed together with last transaction
+                self._write_stats(layer_name_lower, ncount)
+                if resume:
+                    self._set_resume(layer_name_lower, nread, completed=True)
+
+                # commit transaction in output layer
+                if transaction:
+                    olayer.CommitTransaction()
+            except:
+                # writers must not wait for next features, their
+                # transactions are rolled back
+                for writer in writers:
+                    writer.abort()
+                raise
+
+            for writer in writers:
+                writer.finish()
+                writer.output._write_stats(layer_name_lower, writer.ncount)
 
             # print statistics per layer to the stdout
             VfrLogger.msg(" %10d features" % ifeat)
             if mode == Mode.change:
-                n_added = n_updated = n_deleted = 0
-                for action, unused in change_list.itervalues():
-                    if action == Action.update:
-                        n_updated += 1
-                    elif action == Action.add:
-                        n_added += 1
-                    else: # Action.delete:
-                        n_deleted += 1
-                VfrLogger.msg(" (%5d added, %5d updated, %5d deleted)" % \
-                                     (n_added, n_updated, n_deleted))
+                VfrLogger.msg(" (%5d added, %5d updated, %5d deleted, %5d unchanged)" % \
+                                     (change_list.count(Action.add),
+                                      change_list.count(Action.update),
+                                      change_list.count(Action.delete),
+                                      change_list.count(Action.skip)))
             else:
                 VfrLogger.msg(" added")
                 if n_nogeom > 0:
@@ -650,6 +1394,72 @@ class VfrOgr:
 
         return nfeat
 
+    def _write_features(self, olayer, features, writers=[]):
+        """Write features into output layer.
+
+        Geometries are transformed first if requested (see simplify
+        and precision).
+
+        @param olayer: output layer instance
+        @param features: list of features
+        @param writers: list of writers of additional outputs
+
+        @return number of written features
+        """
+        if self._transform:
+            self._transform.run(features)
+
+        ncount = 0
+        for ofeature in features:
+            if olayer.CreateFeature(ofeature) == 0:
+                ncount += 1
+            for writer in writers:
+                writer.write(ofeature)
+
+        return ncount
+
+    def _commit_batch(self, olayer, layer_name, ncount, nread=None,
+                      table_name=None, fid=-1):
+        """Commit batch of features and start new transaction.
+
+        Number of features (stats table) and optionally number of
+        read input features (resume table) is committed together with
+        the batch.
+
+        @param olayer: output layer instance
+        @param layer_name: name of output layer
+        @param ncount: number of features in output layer
+        @param nread: number of read input features (None to skip resume table)
+        @param table_name: name of PG table which sequence is updated
+        @param fid: last feature id
+        """
+        self._write_stats(layer_name, ncount)
+        if nread is not None:
+            self._set_resume(layer_name, nread)
+        olayer.CommitTransaction()
+        if table_name and fid > 0:
+            self._update_fid_seq(table_name, fid)
+        olayer.StartTransaction()
+        VfrLogger.debug("Layer {}: {} features committed".format(layer_name, ncount))
+
+    def _set_geometry_name(self, layer_name):
+        """Fix output drivers not to use default geometry names.
+
+        @param layer_name: name of output layer
+        """
+        if self.frmt not in ('PostgreSQL', 'OCI') or self._geom_name:
+            return
+
+        self._remove_option('GEOMETRY_NAME')
+        if layer_name == 'ulice':
+            geom_name = 'definicnicara'
+        elif layer_name == 'adresnimista':
+            geom_name = 'adresnibod'
+        else:
+            geom_name = 'definicnibod'
+
+        self._lco_options.append('GEOMETRY_NAME={}'.format(geom_name))
+
     def _remove_option(self, name):
         """Remove specified option from list
 
@@ -707,9 +1517,9 @@ class VfrOgr:
         else:
             geom_type = ogr.wkbNone
 
-        # create new layer
-        olayer = self._ods.CreateLayer(layerName, ilayer.GetSpatialRef(),
-                                       geom_type, self._lco_options)
+        # create new layer (see t_srs)
+        srs = self._t_srs if self._t_srs else ilayer.GetSpatialRef()
+        olayer = self._ods.CreateLayer(layerName, srs, geom_type, self._lco_options)
 
         if not olayer:
             raise VfrError("Unable to create layer '%'" % layerName)
@@ -718,6 +1528,8 @@ class VfrOgr:
         feat_defn = ilayer.GetLayerDefn()
         for i in range(feat_defn.GetFieldCount()):
             ifield = feat_defn.GetFieldDefn(i)
+            if ifield.IsIgnored():
+                continue # not requested (see --columns)
             ofield = ogr.FieldDefn(ifield.GetNameRef(), ifield.GetType())
             ofield.SetWidth(ifield.GetWidth())
             if ofrmt == 'ESRI Shapefile':
@@ -730,6 +1542,12 @@ class VfrOgr:
 
             olayer.CreateField(ofield)
 
+        if self._content_hash:
+            # content hash (see _get_hash())
+            ofield = ogr.FieldDefn(HASH_COLUMN, ogr.OFTString)
+            ofield.SetWidth(40)
+            olayer.CreateField(ofield)
+
         # create also geometry attributes
         if not geom_name and \
                 olayer.TestCapability(ogr.OLCCreateGeomField):
@@ -738,36 +1556,104 @@ class VfrOgr:
                 if geom_name and \
                    geom_defn.GetName() != geom_name:
                     continue
-                olayer.CreateGeomField(feat_defn.GetGeomFieldDefn(i))
+                if geom_defn.IsIgnored():
+                    continue # not requested (see --columns)
+                if self._t_srs:
+                    geom_defn = ogr.GeomFieldDefn(geom_defn.GetName(), geom_defn.GetType())
+                    geom_defn.SetSpatialRef(self._t_srs)
+                olayer.CreateGeomField(geom_defn)
 
         return olayer
 
-    def _get_geom_count(self, layer):
-        """Get list of geometry column for specified layer.
+    def _get_layer_stats(self, layer):
+        """Get statistics for specified layer (one pass).
 
         @param: layer instance
-        
-        @return list of column names
+
+        @return dictionary with number of features and statistics per
+        geometry column (number of non-null and invalid geometries,
+        number of vertices and extent)
         """
+        def count_vertices(geom):
+            if geom.GetGeometryCount() > 0:
+                return sum(count_vertices(geom.GetGeometryRef(i))
+                           for i in range(geom.GetGeometryCount()))
+            return geom.GetPointCount()
+
         defn = layer.GetLayerDefn()
         geom_list = list()
         for i in range(defn.GetGeomFieldCount()):
-            geom_list.append([defn.GetGeomFieldDefn(i).GetName(), 0])
+            geom_list.append({ 'count' : 0, 'invalid' : 0, 'vertices' : 0, 'extent' : None })
 
+        nfeat = 0
+        layer.ResetReading()
         for feature in layer:
+            nfeat += 1
             for i in range(len(geom_list)):
-                if feature.GetGeomFieldRef(i):
-                    geom_list[i][1] += 1
+                geom = feature.GetGeomFieldRef(i)
+                if not geom:
+                    continue
+                gstats = geom_list[i]
+                gstats['count'] += 1
+                if not geom.IsValid():
+                    gstats['invalid'] += 1
+                gstats['vertices'] += count_vertices(geom)
+                xmin, xmax, ymin, ymax = geom.GetEnvelope()
+                if gstats['extent'] is None:
+                    gstats['extent'] = [xmin, ymin, xmax, ymax]
+                else:
+                    extent = gstats['extent']
+                    gstats['extent'] = [min(extent[0], xmin), min(extent[1], ymin),
+                                        max(extent[2], xmax), max(extent[3], ymax)]
+
+        geometries = {}
+        for i in range(len(geom_list)):
+            geometries[defn.GetGeomFieldDefn(i).GetName()] = geom_list[i]
 
-        return geom_list
+        return { 'features' : nfeat, 'geometries' : geometries }
 
-    def _modify_feature(self, feature, geom_idx, ofeature, suppress=True):
+    def _get_layer_stats_ds(self, layer_name):
+        """Get statistics for specified layer using own datasource.
+
+        Used by parallel jobs, datasource instances cannot be shared
+        between threads.
+
+        @param layer_name: name of input layer
+
+        @return statistics (see _get_layer_stats())
+        """
+        ds = self._open_input(self._ids_name)
+        if ds is None:
+            raise VfrError("Unable to open file '%s'" % self._ids_name)
+        try:
+            return self._get_layer_stats(ds.GetLayerByName(layer_name))
+        finally:
+            ds = None
+
+    def write_report(self):
+        """Write extended statistics into JSON file (see --report).
+        """
+        if not self._report or not self._report_data:
+            return
+
+        with open(self._report, 'w') as fd:
+            json.dump(self._report_data, fd, indent=2)
+        VfrLogger.msg("Report written to <{}>".format(self._report), header=True)
+
+    def _modify_feature(self, feature, geom_idx, ofeature, suppress=True, geom_src=-1):
         """Modify output feature - remove remaining geometry columns.
 
+        Geometry already transferred by SetFrom() is kept as it is,
+        otherwise requested geometry is cloned. Until geom_idx is
+        determined (first feature with geometry) SetFrom() may copy
+        another geometry which is replaced here, then geometry is
+        copied once per feature.
+
         @param feature: input feature
         @param geom_idx: index of geometry column to be kept
         @param ofeature: feature to be modified
         @param suppress: suppress warnings
+        @param geom_src: index of input geometry already set in output feature
         """
         # set requested geometry
         if geom_idx < 0:
@@ -780,8 +1666,11 @@ class VfrOgr:
 
         if geom_idx > -1:
             geom = feature.GetGeomFieldRef(geom_idx)
-            if geom:
-                ofeature.SetGeometry(geom.Clone())
+            if geom and geom_idx == geom_src:
+                pass # already transferred
+            elif geom:
+                # output feature takes ownership of the copy
+                ofeature.SetGeometryDirectly(geom.Clone())
             else:
                 ofeature.SetGeometry(None)
                 if not suppress:
@@ -790,19 +1679,53 @@ class VfrOgr:
                     
         return geom_idx
 
+    def _get_hash(self, feature):
+        """Get content hash of input feature.
+
+        Hash is computed over all attributes and all geometries (WKB,
+        little endian) of input (VFR) feature.
+
+        @param feature: input feature
+
+        @return hash as hex string
+        """
+        content = hashlib.sha1() # nosec B324
+        for i in range(feature.GetFieldCount()):
+            if feature.IsFieldSet(i):
+                value = feature.GetFieldAsString(i)
+            else:
+                value = ''
+            content.update(value.encode('utf-8'))
+            content.update(b'\0')
+        for i in range(feature.GetGeomFieldCount()):
+            geom = feature.GetGeomFieldRef(i)
+            if geom:
+                content.update(bytes(geom.ExportToWkb(ogr.wkbNDR)))
+            content.update(b'\0')
+
+        return content.hexdigest()
+
     def _process_changes(self, ilayer, olayer, column='gml_id'):
         """Process list of features (per layer) to be modified (update/add).
 
+        If output layer has content hash column, features which are
+        not modified are marked as Action.skip.
+
         @todo: use numeric data as key
 
         @param ilayer: input layer instance
         @param olayer: output layer instance
         @param column: key column to be processed
         
-        @return directory where keys are fids from input (VFR) layer and
-        items are tuples (action, fid of existing feature if found)
+        Content hashes of updated features are kept in _change_hashes
+        (computed only once, see _convert_vfr()).
+
+        @return map (see ChangeMap) where keys are fids from input (VFR)
+        layer and items are tuples (action, fid of existing feature if found)
         """
-        changes_list = {}
+        changes_list = ChangeMap(self._change_budget)
+        self._change_hashes = {}
+        use_hash = olayer.GetLayerDefn().GetFieldIndex(HASH_COLUMN) > -1
 
         ilayer.ResetReading()
         ifeature = ilayer.GetNextFeature()
@@ -810,14 +1733,24 @@ class VfrOgr:
             fcode = ifeature.GetField(column)
             # check if feature already exists in output layer
             found = []
+            found_hash = None
             olayer.SetAttributeFilter("%s = '%s'" % (column, fcode))
             for feature in olayer:
                 found.append(feature.GetFID())
+                if use_hash and found_hash is None:
+                    found_hash = feature.GetField(HASH_COLUMN)
 
             n_feat = len(found)
 
-            changes_list[ifeature.GetFID()] = (Action.update, found[0]) if n_feat > 0 \
-                                              else (Action.add, -1)
+            fhash = self._get_hash(ifeature) if n_feat > 0 and found_hash else None
+            if n_feat < 1:
+                changes_list[ifeature.GetFID()] = (Action.add, -1)
+            elif fhash and found_hash == fhash:
+                changes_list[ifeature.GetFID()] = (Action.skip, found[0])
+            else:
+                if fhash:
+                    self._change_hashes[ifeature.GetFID()] = fhash
+                changes_list[ifeature.GetFID()] = (Action.update, found[0])
 
             if n_feat > 1:
                 # TODO: how to handle correctly?
@@ -826,7 +1759,8 @@ class VfrOgr:
                             (olayer.GetName(), n_feat, fcode))
                 for fid in found[1:]:
                     # delete duplicates
-                    olayer.DeleteFeature(fid)
+                    if olayer.DeleteFeature(fid) == 0:
+                        self._n_duplicated += 1
 
             ifeature = ilayer.GetNextFeature()
 
@@ -843,30 +1777,10 @@ class VfrOgr:
         @return: list of deleted features per layer as tuple (action,
         fid)
         """
-        lcode2lname = {
-            'ST' : 'Staty',
-            'RS' : 'RegionySoudrznosti',
-            'KR' : 'Kraje',
-            'VC' : 'Vusc',
-            'OK' : 'Okresy',
-            'OP' : 'Orp',
-            'PU' : 'Pou',
-            'OB' : 'Obce',
-            'SP' : 'SpravniObvody',
-            'MP' : 'Mop',
-            'MC' : 'Momc',
-            'CO' : 'CastiObci',
-            'KU' : 'KatastralniUzemi',
-            'ZJ' : 'Zsj',
-            'UL' : 'Ulice',
-            'PA' : 'Parcely',
-            'SO' : 'StavebniObjekty',
-            'AD' : 'AdresniMista',
-            }
         column = 'gml_id'
         dlist = {}
-        for layer_name in lcode2lname.itervalues():
-            dlist[layer_name] = {}
+        for layer_name in LCODE2LNAME.values():
+            dlist[layer_name] = ChangeMap(self._change_budget)
 
         layer.ResetReading()
         feature = layer.GetNextFeature()
@@ -874,7 +1788,7 @@ class VfrOgr:
         while feature:
             # determine layer and attribute filter for given feature
             lcode = feature.GetField("TypPrvkuKod")
-            layer_name = lcode2lname.get(lcode, None)
+            layer_name = LCODE2LNAME.get(lcode, None)
             if not layer_name:
                 VfrLogger.error("Unknown layer code '{}'".format(lcode))
                 feature = layer.GetNextFeature()
@@ -914,51 +1828,394 @@ class VfrOgr:
         # return statistics
         return dlist
 
-    def run(self, append=False, extended=False):
+    def _merge_changes(self, file_list):
+        """Collapse changes from several files into one datasource.
+
+        Files must be ordered by date. Only the last state of each
+        feature (gml_id) is kept. Features deleted in later file are
+        removed from the change set, features re-created later
+        override their deletion.
+
+        Raise VfrError on failure.
+
+        @param file_list: list of VFR files (changes only)
+
+        @return datasource instance (Memory driver)
+        """
+        mds = ogr.GetDriverByName('Memory').CreateDataSource('vfr_changes')
+        if mds is None:
+            raise VfrError("Unable to create memory datasource")
+
+        # fids of features in memory layers, keys are gml_ids
+        fids = {}
+        for fname in file_list:
+            ids = self._open_ds(fname)
+            layers = [ids.GetLayer(i) for i in range(ids.GetLayerCount())]
+            # deleted features first (see _convert_vfr())
+            layers.sort(key=lambda l: l.GetName() != 'ZaniklePrvky')
+            for ilayer in layers:
+                layer_name = ilayer.GetName()
+                mlayer = mds.GetLayerByName(layer_name)
+                if mlayer is None:
+                    defn = ilayer.GetLayerDefn()
+                    mlayer = mds.CreateLayer(layer_name, ilayer.GetSpatialRef(), ogr.wkbNone)
+                    for i in range(defn.GetFieldCount()):
+                        mlayer.CreateField(defn.GetFieldDefn(i))
+                    for i in range(defn.GetGeomFieldCount()):
+                        mlayer.CreateGeomField(defn.GetGeomFieldDefn(i))
+                    fids[layer_name] = {}
+
+                for feature in ilayer:
+                    if layer_name == 'ZaniklePrvky':
+                        # deleted feature, drop its previous changes
+                        lcode = feature.GetField("TypPrvkuKod")
+                        fcode = "%s.%s" % (lcode, feature.GetField("PrvekId"))
+                        target = fids.get(LCODE2LNAME.get(lcode, None), {})
+                        if fcode in target:
+                            mds.GetLayerByName(LCODE2LNAME[lcode]).DeleteFeature(target.pop(fcode))
+                    else:
+                        fcode = feature.GetField('gml_id')
+                        # feature re-created, drop its deletion
+                        deleted = fids.get('ZaniklePrvky', {})
+                        if fcode in deleted:
+                            mds.GetLayerByName('ZaniklePrvky').DeleteFeature(deleted.pop(fcode))
+
+                    # only last state of feature is kept
+                    if fcode in fids[layer_name]:
+                        mlayer.DeleteFeature(fids[layer_name][fcode])
+                    mfeature = ogr.Feature(mlayer.GetLayerDefn())
+                    mfeature.SetFrom(feature, True)
+                    mlayer.CreateFeature(mfeature)
+                    fids[layer_name][fcode] = mfeature.GetFID()
+
+            ids.Close()
+
+        for layer_name in fids.keys():
+            VfrLogger.msg("Layer            %-20s ... %10d changes merged\n" % \
+                          (layer_name, len(fids[layer_name])))
+
+        self._ids = mds
+
+        return self._ids
+
+    def _get_state(self, ftype):
+        """Get date of last applied changes (service mode).
+
+        @param ftype: type of changes, eg. 'ST_ZKSH'
+
+        @return date as string or None if not defined
+        """
+        layer = self._ods.GetLayerByName(STATE_LAYER)
+        if layer is None:
+            return None
+
+        date = None
+        layer.SetAttributeFilter("type = '%s'" % ftype)
+        for feature in layer:
+            date = feature.GetField('date')
+        layer.SetAttributeFilter(None)
+
+        return date
+
+    def _set_control(self, name, fields, key, values):
+        """Insert or update record of control table (created if not exists).
+
+        Raise VfrError on failure.
+
+        @param name: name of control table
+        @param fields: list of tuples (column, type, width)
+        @param key: tuple (key column, value) or list of such tuples
+        @param values: dictionary of values to be set
+        """
+        layer = self._ods.GetLayerByName(name)
+        if layer is None:
+            layer = self._ods.CreateLayer(name, None, ogr.wkbNone, [])
+            if layer is None:
+                raise VfrError("Unable to create layer '%s'" % name)
+            for column, ctype, width in fields + [('updated', ogr.OFTString, 19)]:
+                field = ogr.FieldDefn(column, ctype)
+                field.SetWidth(width)
+                layer.CreateField(field)
+
+        keys = key if isinstance(key, list) else [key]
+        layer.SetAttributeFilter(' AND '.join("%s = '%s'" % k for k in keys))
+        feature = layer.GetNextFeature()
+        layer.SetAttributeFilter(None)
+        if feature is None:
+            feature = ogr.Feature(layer.GetLayerDefn())
+            for column, value in keys:
+                feature.SetField(column, value)
+        for column, value in values.items():
+            feature.SetField(column, value)
+        feature.SetField('updated', strftime("%Y-%m-%d %H:%M:%S", gmtime()))
+        if feature.GetFID() < 0:
+            layer.CreateFeature(feature)
+        else:
+            layer.SetFeature(feature)
+
+    def _set_state(self, ftype, date):
+        """Store date of last applied changes into control table.
+
+        @param ftype: type of changes, eg. 'ST_ZKSH'
+        @param date: date as string
+        """
+        self._set_control(STATE_LAYER,
+                          [('type', ogr.OFTString, 20), ('date', ogr.OFTString, 8)],
+                          ('type', ftype), { 'date' : date })
+
+    def _get_resume(self, layer_name):
+        """Get state of current input file and layer in interrupted
+        import.
+
+        @param layer_name: name of output layer
+
+        @return tuple (number of input features already committed,
+        True if layer of the file was completed)
+        """
+        layer = self._ods.GetLayerByName(RESUME_LAYER)
+        if layer is None:
+            return 0, False
+
+        nread = 0
+        completed = False
+        layer.SetAttributeFilter("layer = '%s' AND file = '%s'" % \
+                                 (layer_name, os.path.basename(self._ids_name)))
+        for feature in layer:
+            nread = feature.GetField('features') or 0
+            completed = bool(feature.GetField('completed'))
+        layer.SetAttributeFilter(None)
+
+        return nread, completed
+
+    def _set_resume(self, layer_name, nread, completed=False):
+        """Store number of committed input features of current input
+        file into resume table.
+
+        @param layer_name: name of output layer
+        @param nread: number of read input features
+        @param completed: True if layer of the file is completed
+        """
+        if int(gdal.__version__.split('.')[0]) >= 2:
+            ftype = ogr.OFTInteger64
+        else:
+            ftype = ogr.OFTInteger
+        self._set_control(RESUME_LAYER,
+                          [('layer', ogr.OFTString, 40), ('file', ogr.OFTString, 120),
+                           ('features', ftype, 0), ('completed', ogr.OFTInteger, 0)],
+                          [('layer', layer_name), ('file', os.path.basename(self._ids_name))],
+                          { 'features' : nread, 'completed' : 1 if completed else 0 })
+
+    def _clear_resume(self):
+        """Remove all records of resume table (run finished, nothing
+        to be resumed).
+        """
+        if self._ods is None or self.frmt not in CONTROL_DRIVERS:
+            return
+        layer = self._ods.GetLayerByName(RESUME_LAYER)
+        if layer is None:
+            return
+
+        fids = [feature.GetFID() for feature in layer]
+        for fid in fids:
+            layer.DeleteFeature(fid)
+
+    def _read_stats(self):
+        """Read number of features per layer from stats table.
+
+        @return dictionary where keys are layer names (lower case)
+        """
+        stats = {}
+        layer = self._ods.GetLayerByName(STATS_LAYER)
+        if layer is None:
+            return stats
+
+        layer.ResetReading()
+        for feature in layer:
+            stats[feature.GetField('layer')] = feature.GetField('features')
+
+        return stats
+
+    def _write_stats(self, layer_name, count):
+        """Store number of features of output layer into stats table.
+
+        Stats are written only for drivers listed in CONTROL_DRIVERS,
+        failure is reported as warning (stats are optional).
+
+        @param layer_name: name of output layer
+        @param count: number of features
+        """
+        if self.frmt not in CONTROL_DRIVERS:
+            return
+
+        if int(gdal.__version__.split('.')[0]) >= 2:
+            ftype = ogr.OFTInteger64
+        else:
+            ftype = ogr.OFTInteger
+        try:
+            self._set_control(STATS_LAYER,
+                              [('layer', ogr.OFTString, 40), ('features', ftype, 0)],
+                              ('layer', layer_name), { 'features' : count })
+        except (VfrError, RuntimeError) as e:
+            VfrLogger.warning("Unable to store number of features of '%s': %s" % \
+                              (layer_name, e))
+
+    def _get_feature_count(self, layer, stats):
+        """Get number of features in output layer.
+
+        Count from stats table is used if available.
+
+        @param layer: output layer instance
+        @param stats: stats (see _read_stats())
+
+        @return number of features
+        """
+        count = stats.get(layer.GetName().lower())
+        if count is None:
+            count = layer.GetFeatureCount()
+
+        return count
+
+    def _estimate_feature_count(self, layer):
+        """Get estimated number of features in output layer (used
+        only in summary, see VfrPg).
+
+        @param layer: output layer instance
+
+        @return number of features or None if not available
+        """
+        return None
+
+    def run_service(self, ftype, date=None, interval=0):
+        """Apply daily changes, optionally periodically.
+
+        Changes not applied yet (see control table) are collapsed into
+        one change set and applied in one pass.
+
+        Raise VfrError on failure.
+
+        @param ftype: type of changes, eg. 'ST_ZKSH'
+        @param date: first day (when state is unknown) or date interval
+        @param interval: period in seconds (0 to apply changes only once)
+
+        @return number of applied files
+        """
+        nfiles = 0
+        while True:
+            # determine days to be processed
+            last = self._get_state(ftype)
+            if date and ':' in date:
+                sdate, edate = date.split(':', 1)
+            else:
+                sdate, edate = date, yesterday()
+            if last:
+                next_day = datetime.datetime.strptime(last, "%Y%m%d").date() + \
+                           datetime.timedelta(days=1)
+                if not sdate or next_day.strftime("%Y%m%d") > sdate:
+                    sdate = next_day.strftime("%Y%m%d")
+            elif not sdate:
+                raise VfrError("State of '%s' unknown, first day must be given" % ftype)
+            if not edate:
+                edate = yesterday()
+
+            # collect files (stops on first missing day), published
+            # days are taken from local catalogue if available
+            self.reset()
+            if sdate > edate:
+                date_list = []
+            elif self._get_catalogue() and self._catalogue.refresh():
+                date_list = sorted(set(self._catalogue.dates(ftype, sdate, edate) + \
+                                       [d for d in self._archive.dates(ftype) \
+                                        if sdate <= d <= edate]))
+            else:
+                date_list = get_date_interval('%s:%s' % (sdate, edate))
+            for d in date_list:
+                try:
+                    self.download(["{}_{}.xml.{}".format(d, ftype, extension())])
+                except VfrError as e:
+                    VfrLogger.msg("{}\n".format(e))
+                    break
+
+            if self._file_list:
+                # changes are merged into one pass, state is moved
+                # forward only when the pass succeeded
+                self.run(append=True, merge=True)
+                if self.failed:
+                    msg = "Changes of %s not applied, state left at %s" % (ftype, last or "unknown")
+                    if not interval:
+                        raise VfrError(msg)
+                    VfrLogger.error(msg) # retry in next period
+                else:
+                    last = re.search(r'(\d{8})_', os.path.basename(self._file_list[-1])).group(1)
+                    self._set_state(ftype, last)
+                    nfiles += len(self._file_list)
+                    VfrLogger.msg("Changes applied up to %s" % last, header=True)
+            else:
+                VfrLogger.msg("No new changes for %s" % ftype, header=True)
+
+            if not interval:
+                break
+            time.sleep(interval)
+
+        return nfiles
+
+    def run(self, append=False, extended=False, merge=False):
         """Run conversion process.
 
         @param append: True for append mode (add features to output)
         @param extended: True for extended statistics
+        @param merge: True to collapse all files (changes) into one pass
 
-        @return number of passes
+        @return number of passes (files which failed are listed in
+        failed attribute)
         """
         ipass = 0
+        self.failed = []
         stime = time.time()
         layer_list = copy.deepcopy(self._layer_list)
         
         pg = hasattr(self, "_conn") # PG is output datasource
         if pg:
             self.schema_list = []
-            epsg_checked = False
-        
-        for fname in self._file_list:
+
+        file_list = self._file_list
+        if merge and len(file_list) > 1:
+            # collapse changes into one pass (named by last file)
+            file_list = [file_list]
+
+        for item in file_list:
+            fname = item[-1] if isinstance(item, list) else item
             VfrLogger.msg("Processing %s (%d out of %d)..." % \
-                          (fname, ipass+1, len(self._file_list)), header=True)
+                          (fname, ipass+1, len(file_list)), header=True)
             
             # open OGR datasource
             try:
-                ids = self._open_ds(fname)
+                if isinstance(item, list):
+                    ids = self._merge_changes(item)
+                else:
+                    ids = self._open_ds(fname)
             except VfrError as e:
                 VfrLogger.error(str(e))
+                self.failed.append(item)
                 continue
             
             if ids is None:
                 ipass += 1
+                self.failed.append(item)
                 continue # unable to open - skip
             
             if not self.odsn:
                 # no output datasource given -> list available layers and exit
                 layer_list = self._list_layers(extended, sys.stdout)
-                if extended and os.path.exists(filename):
-                    compare_list(layer_list, parse_xml(filename))
+                if extended and os.path.exists(fname):
+                    compare_list(layer_list, parse_xml(fname))
             else:
                 if self.odsn is None:
                     self.odsn = '.' # current directory
                     
-                if pg and not epsg_checked:
+                if pg and not self._epsg_checked:
                     # check if EPSG 5514 exists in output DB (only first pass)
                     self._check_epsg()
-                    epsg_checked = True
+                    self._epsg_checked = True
                     
                 if not layer_list:
                     for l in self._list_layers(fd=None):
@@ -1007,6 +2264,11 @@ class VfrOgr:
                     nfeat = self._convert_vfr(mode, schema_name)
                 except RuntimeError as e:
                     raise VfrError("Unable to read %s: %s" % (fname, e))
+
+                # report memory usage (peak since start of the process)
+                rss = peak_rss()
+                if rss is not None:
+                    VfrLogger.msg("Peak memory usage: %d MB" % rss, header=True)
                 
                 if pg:
                     # reset datasource string per file
@@ -1023,5 +2285,9 @@ class VfrOgr:
             ids.Close()
             self._ids = None
             ipass += 1
+
+        if self.odsn and not self.failed:
+            # all files imported, interrupted import is not resumed
+            self._clear_resume()
         
         return ipass
@@ -8,18 +8,32 @@
 #
 ###############################################################################
 
+import re
 import sys
-
-from .vfrogr import VfrOgr, Mode
+from concurrent.futures import ThreadPoolExecutor
+try:
+    # Python 2
+    from Queue import Queue
+except ImportError:
+    # Python 3
+    from queue import Queue
+
+from .vfrogr import VfrOgr, Mode, CONTROL_LAYERS
 from .logger import VfrLogger
 from .exception import VfrError
 
 class VfrPg(VfrOgr):
-    def __init__(self, schema='public', schema_per_file=False, **kwargs):
+    def __init__(self, schema='public', schema_per_file=False, estimate_count=False,
+                 index_concurrently=False, gist_columns=[], **kwargs):
         """Class for importing VFK data into PostGIS database.
 
         @param schema: name of schema where to import data
         @param schema_per_file: True to create for each file separate schema
+        @param estimate_count: True to use planner estimates as number of features
+        @param index_concurrently: True to create indices concurrently
+        @param gist_columns: list of geometry columns to be indexed after
+        import (spatial indices are not created during import, other
+        geometry columns are indexed after import too)
         @param args: other argumenets, see VfrOgr class for details
         """
         if kwargs['dsn']:
@@ -29,18 +43,30 @@ class VfrPg(VfrOgr):
         VfrOgr.__init__(self, "PostgreSQL", **kwargs)
         self._schema = schema
         self._schema_per_file = schema_per_file
+        self._estimate_count = estimate_count
+        self._index_concurrently = index_concurrently
+        self._gist_columns = [c.lower() for c in gist_columns]
         
         # build dsn string and options
         self._lco_options = []
+        if self._gist_columns:
+            # spatial indices are created later by create_indices()
+            self._lco_options.append('SPATIAL_INDEX=NO')
         if self.odsn:
             # open connection to DB
             self._conn = self._opendb(self.odsn[3:])
         else:
             self._conn = None
         self.schema_list = None
+        self._epsg_checked = False # checked once per connection (see run())
                 
-    def __del__(self):
-        self._conn.close()
+    def close(self):
+        """Close DB connection and datasources (see VfrOgr.close()).
+        """
+        if getattr(self, '_conn', None):
+            self._conn.close()
+            self._conn = None
+        VfrOgr.close(self)
 
     def _get_dbname(self, dsn):
         """Get dbname from datasource string
@@ -118,7 +144,12 @@ class VfrPg(VfrOgr):
         cursor.close()
 
     def create_indices(self):
-        """Create indices for output tables (gml_id).
+        """Create indices for output tables (gml_id and selected
+        geometry columns).
+
+        Existing indices are discovered by one query, missing indices
+        are created in parallel (see --jobs), each job uses its own
+        connection.
         """
         if not self._conn:
             return
@@ -126,42 +157,172 @@ class VfrPg(VfrOgr):
         if not self.schema_list:
             self.schema_list = ['public']
 
-        if not self._layer_list:
+        # don't modify list of selected layers (used by next runs)
+        layer_list = list(self._layer_list)
+        if not layer_list:
             for idx in range(self._ods.GetLayerCount()):
-                self._layer_list.append(self._ods.GetLayer(idx).GetName())
+                layer_list.append(self._ods.GetLayer(idx).GetName())
         
         column = "gml_id"
 
-        cursor = self._conn.cursor()
+        # list of tables to be indexed
+        tables = []
         for schema in self.schema_list:
-            for layer in self._layer_list:
-                if layer == 'ZaniklePrvky':
-                    # skip deleted features
+            for layer in layer_list:
+                if layer == 'ZaniklePrvky' or layer in CONTROL_LAYERS:
+                    # skip deleted features and control tables
                     continue
 
                 if '.' in layer:
-                    schema, table = map(lambda x: x.lower(), layer.split('.', 1))
+                    tables.append(tuple(map(lambda x: x.lower(), layer.split('.', 1))))
                 else:
-                    table = layer.lower()
+                    tables.append((schema, layer.lower()))
+        schemas = list(set(t[0] for t in tables))
+
+        # discover existing indices and geometry columns
+        cursor = self._conn.cursor()
+        cursor.execute("SELECT schemaname, tablename, indexname, indexdef FROM pg_indexes "
+                       "WHERE schemaname = ANY(%s)", (schemas,))
+        indices = set()
+        indexdefs = {} # index definitions per table
+        for schema, table, indexname, indexdef in cursor.fetchall():
+            indices.add((schema, indexname))
+            indexdefs.setdefault((schema, table), []).append(indexdef.lower())
+        geom_columns = set()
+        if self._gist_columns:
+            cursor.execute("SELECT f_table_schema, f_table_name, f_geometry_column "
+                           "FROM geometry_columns WHERE f_table_schema = ANY(%s)", (schemas,))
+            geom_columns = set(cursor.fetchall())
+        cursor.close()
+
+        # build list of missing indices
+        concurrently = 'CONCURRENTLY ' if self._index_concurrently else ''
+        stmt_list = []
+        for schema, table in tables:
+            indexname = "%s_%s_idx" % (table, column)
+            if (schema, indexname) not in indices:
+                stmt_list.append((indexname, "CREATE INDEX %s%s ON %s.%s (%s)" % \
+                                  (concurrently, indexname, schema, table, column)))
+
+            # spatial indices are not created by OGR when --gist is
+            # given, other geometry columns are indexed after selected ones
+            gcolumns = [c for c in self._gist_columns if (schema, table, c) in geom_columns]
+            gcolumns += sorted(c for s, t, c in geom_columns \
+                               if (s, t) == (schema, table) and c not in gcolumns)
+            for gcolumn in gcolumns:
+                indexname = "%s_%s_geom_idx" % (table, gcolumn)
+                if (schema, indexname) in indices or \
+                   any('using gist (%s)' % gcolumn in indexdef
+                       for indexdef in indexdefs.get((schema, table), [])):
+                    continue # spatial index already exists
+                stmt_list.append((indexname, "CREATE INDEX %s%s ON %s.%s USING GIST (%s)" % \
+                                  (concurrently, indexname, schema, table, gcolumn)))
+
+        if not stmt_list:
+            return
+
+        # create indices in parallel (pool of connections)
+        import psycopg2
+        pool = Queue()
+
+        def create_index(item):
+            indexname, stmt = item
+            conn = pool.get()
+            try:
+                cursor = conn.cursor()
+                cursor.execute(stmt)
+                cursor.close()
+            except Exception as e:
+                VfrLogger.warning("Unable to create index %s: %s" % (indexname, e))
+            finally:
+                pool.put(conn)
+
+        try:
+            for i in range(min(self._jobs, len(stmt_list))):
+                try:
+                    conn = psycopg2.connect(self.odsn[3:])
+                except psycopg2.OperationalError as e:
+                    raise VfrError("Unable to connect to DB: %s" % e)
+                conn.autocommit = True # required by CREATE INDEX CONCURRENTLY
+                pool.put(conn)
+
+            VfrLogger.msg("Creating %d indices..." % len(stmt_list), header=True)
+            with ThreadPoolExecutor(pool.qsize()) as executor:
+                list(executor.map(create_index, stmt_list))
+        finally:
+            while not pool.empty():
+                pool.get().close()
+
+    def cluster_tables(self):
+        """Cluster output tables on GiST index of geometry column.
+
+        Physical order of rows is changed to follow spatial index,
+        see --spatial-sort.
+        """
+        if not self._conn:
+            return
 
-                indexname = "%s_%s_idx" % (table, column)
-                cursor.execute("SELECT COUNT(*) FROM pg_indexes WHERE "
-                               "tablename = %s and schemaname = %s and "
-                               "indexname = %s", (table, schema, indexname))
-                if cursor.fetchall()[0][0] > 0:
-                    continue # indices for specified table already exists
+        if not self.schema_list:
+            self.schema_list = ['public']
 
+        cursor = self._conn.cursor()
+        for schema in self.schema_list:
+            cursor.execute("SELECT tablename, indexname FROM pg_indexes WHERE "
+                           "schemaname = %s and indexdef ILIKE '%%USING gist%%' "
+                           "ORDER BY tablename, indexname", (schema,))
+            clustered = []
+            for table, indexname in cursor.fetchall():
+                if table in clustered:
+                    continue # table can be clustered only on one index
+                if self._layer_list and \
+                   table not in map(lambda x: x.lower(), self._layer_list):
+                    continue
+                clustered.append(table)
+                VfrLogger.msg("Clustering table %-20s ...\n" % table)
                 cursor.execute('BEGIN')
                 try:
-                    cursor.execute("CREATE INDEX %s ON %s.%s (%s)" % \
-                                       (indexname, schema, table, column))
+                    cursor.execute('CLUSTER %s.%s USING %s' % (schema, table, indexname))
                     cursor.execute('COMMIT')
                 except Exception as e:
-                    VfrLogger.warning("Unable to create index %s_%s: %s" % (table, column, e))
+                    VfrLogger.warning("Unable to cluster table %s: %s" % (table, e))
                     cursor.execute('ROLLBACK')
 
         cursor.close()
 
+    def _estimate_feature_count(self, layer):
+        """Get planner estimate of number of features in output table
+        (pg_class.reltuples) if requested.
+
+        Table without qualified name is searched in active schema of
+        datasource, given schema or current schema of connection.
+
+        @param layer: output layer instance
+
+        @return number of features or None if not available
+        """
+        if not self._estimate_count or not self._conn:
+            return None
+
+        name = layer.GetName().lower()
+        if '.' in name:
+            schema, table = name.split('.', 1)
+        else:
+            match = re.search(r'active_schema=(\S+)', self.odsn or '')
+            schema = match.group(1) if match else self._schema
+            table = name
+        cursor = self._conn.cursor()
+        cursor.execute("SELECT c.reltuples::bigint FROM pg_class c "
+                       "JOIN pg_namespace n ON n.oid = c.relnamespace "
+                       "WHERE c.relname = %s and n.nspname = COALESCE(%s, current_schema())",
+                       (table, schema.lower() if schema else None))
+        row = cursor.fetchone()
+        cursor.close()
+        # never analyzed tables have -1 (PostgreSQL >= 14) or 0
+        if row and row[0] > 0:
+            return row[0]
+
+        return None
+
     def _update_fid_seq(self, table, fid, column = 'ogc_fid'):
         """Update fid sequence.
 
@@ -0,0 +1 @@
+@python "%OSGEO4W_ROOT%\bin\vfrworker.py" %*
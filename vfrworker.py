@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+
+###############################################################################
+#
+# VFR importer based on GDAL library
+#
+# Author: Martin Landa <landa.martin gmail.com>
+#
+# Licence: MIT/X
+#
+###############################################################################
+
+"""
+Long-running worker processing vfr2ogr/vfr2pg jobs
+
+Jobs are read as JSON lines from stdin (default) or from local socket
+connections, eg.
+
+{"id": "1", "program": "vfr2pg", "args": ["--file", "OB_554782_UKSH", "--dbname", "ruian"]}
+
+Progress and result of each job are written as JSON lines (events
+'started', 'progress', 'done' or 'error'). Python modules, GDAL drivers,
+configuration, DB connections and downloader/catalogue caches are kept
+warm between jobs.
+
+Requires GDAL library version 1.11 or later.
+"""
+
+import os
+import sys
+import json
+import time
+import io
+import socket
+import logging
+import argparse
+import threading
+try:
+    # Python 2
+    import SocketServer as socketserver
+except ImportError:
+    # Python 3
+    import socketserver
+from collections import OrderedDict
+
+import vfr2ogr
+import vfr2pg
+from vfr4ogr.parse import parse_cmd
+from vfr4ogr.utils import peak_rss
+from vfr4ogr.logger import VfrLogger, MSG_LEVEL
+from vfr4ogr.exception import VfrError, VfrErrorCmd
+
+# supported programs
+PROGRAMS = { 'vfr2ogr' : vfr2ogr, 'vfr2pg' : vfr2pg }
+
+# max number of convertors kept open (least recently used are closed)
+CACHE_SIZE = 8
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog="vfrworker",
+                                     description="Processes vfr2ogr/vfr2pg jobs given as JSON lines "
+                                     "(stdin or local socket) in one long-running process. "
+                                     "Requires GDAL library version 1.11 or later.")
+
+    parser.add_argument("--socket",
+                        help="Listen on Unix socket instead of reading stdin")
+    parser.add_argument("--port",
+                        type=int,
+                        help="Listen on TCP port (localhost only) instead of reading stdin")
+    parser.add_argument("--cache-size",
+                        type=int, default=CACHE_SIZE,
+                        help="Max number of convertors (open datasources) kept between jobs (default: %d)" % CACHE_SIZE)
+
+    return parser.parse_args(), parser.print_help
+
+class ProgressHandler(logging.Handler):
+    def __init__(self, callback):
+        """Forward messages of VfrLogger as progress events (line by
+        line).
+
+        @param callback: function called for each line
+        """
+        logging.Handler.__init__(self, MSG_LEVEL)
+        self._callback = callback
+        self._buffer = ''
+
+    def emit(self, record):
+        self._buffer += record.getMessage()
+        lines = self._buffer.split('\n')
+        self._buffer = lines.pop()
+        for line in lines:
+            line = line.strip(' -#')
+            if line:
+                self._callback(line)
+
+    def flush(self):
+        if self._buffer.strip():
+            self._callback(self._buffer.strip())
+        self._buffer = ''
+
+class Worker:
+    def __init__(self, cache_size=CACHE_SIZE):
+        """Process jobs, convertors are cached between jobs.
+
+        @param cache_size: max number of cached convertors
+        """
+        self._cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_convertor(self, program, options):
+        """Get convertor for given options (cached).
+
+        @param program: program name (see PROGRAMS)
+        @param options: parsed options
+
+        @return convertor instance
+        """
+        cls, kwargs = PROGRAMS[program].convertor_options(options)
+        key = (program, json.dumps(kwargs, sort_keys=True, default=str))
+        if key in self._cache:
+            convertor = self._cache.pop(key)
+            convertor.reset()
+        else:
+            convertor = cls(**kwargs)
+            while len(self._cache) >= self._cache_size:
+                self._cache.popitem(last=False)[1].close()
+        self._cache[key] = convertor
+
+        return convertor
+
+    def run_job(self, job, send):
+        """Process one job.
+
+        @param job: job as dictionary (keys 'id', 'program' and 'args')
+        @param send: function called with each event (dictionary)
+
+        @return True on success otherwise False
+        """
+        jid = job.get('id')
+        def event(name, **kwargs):
+            data = OrderedDict([('id', jid), ('event', name)])
+            data.update(kwargs)
+            send(data)
+
+        program = job.get('program', 'vfr2pg')
+        if program not in PROGRAMS:
+            event('error', message="Unknown program '%s'" % program)
+            return False
+        args = job.get('args', [])
+        if not isinstance(args, list):
+            event('error', message="List of arguments expected")
+            return False
+
+        # jobs are processed one by one (GDAL and logging are shared)
+        with self._lock:
+            stime = time.time()
+            srss = peak_rss()
+            event('started', program=program, args=args)
+            handler = ProgressHandler(lambda line: event('progress', message=line))
+            VfrLogger.addHandler(handler)
+            try:
+                try:
+                    options, usage = PROGRAMS[program].parse_args(args)
+                except SystemExit as e: # argparse
+                    event('error', message="Invalid arguments ({})".format(e))
+                    return False
+                if program == 'vfr2pg':
+                    options.format = 'PostgreSQL'
+                file_list = parse_cmd(options)
+                convertor = self._get_convertor(program, options)
+                convertor.cmd_log([program] + args)
+                ipass = PROGRAMS[program].process(convertor, options, file_list)
+            except (VfrError, VfrErrorCmd) as e:
+                event('error', message=str(e))
+                return False
+            except (Exception, SystemExit) as e:
+                # state of convertor is unknown (also when exited by
+                # convertor itself, eg. GDAL check), don't reuse it
+                self.close()
+                event('error', message="{}: {}".format(type(e).__name__, e))
+                return False
+            finally:
+                handler.flush()
+                VfrLogger.removeHandler(handler)
+
+            # peak RSS is process-wide (all jobs so far), growth of
+            # the peak is caused by this job
+            rss = peak_rss()
+            event('done', metrics={ 'passes' : ipass,
+                                    'time' : round(time.time() - stime, 3),
+                                    'process_peak_rss' : rss,
+                                    'peak_rss_growth' : rss - srss if rss is not None else None,
+                                    'cached' : len(self._cache) })
+
+        return True
+
+    def serve(self, infile, outfile):
+        """Process jobs given as JSON lines.
+
+        @param infile: input file object
+        @param outfile: output file object (events)
+        """
+        write_lock = threading.Lock()
+        def send(data):
+            with write_lock:
+                outfile.write(json.dumps(data) + '\n')
+                outfile.flush()
+
+        for line in iter(infile.readline, ''):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                job = json.loads(line)
+                if not isinstance(job, dict):
+                    raise ValueError("object expected")
+            except ValueError as e:
+                send({ 'id' : None, 'event' : 'error', 'message' : "Invalid job: {}".format(e) })
+                continue
+            self.run_job(job, send)
+
+    def close(self):
+        """Close all cached convertors.
+        """
+        while self._cache:
+            self._cache.popitem()[1].close()
+
+def main():
+    options, usage = parse_args()
+    if options.socket and options.port:
+        usage()
+        sys.exit('ERROR: --socket and --port are mutually exclusive')
+
+    worker = Worker(options.cache_size)
+    if not options.socket and not options.port:
+        # stdout is reserved for events (eg. layer listing goes to stderr)
+        outfile = sys.stdout
+        sys.stdout = sys.stderr
+        try:
+            worker.serve(sys.stdin, outfile)
+        finally:
+            worker.close()
+        return 0
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            worker.serve(io.TextIOWrapper(self.rfile, encoding='utf-8'),
+                         io.TextIOWrapper(self.wfile, encoding='utf-8', write_through=True))
+
+    if options.socket:
+        if not hasattr(socket, 'AF_UNIX'):
+            sys.exit('ERROR: Unix sockets not supported, use --port')
+        if os.path.exists(options.socket):
+            os.remove(options.socket)
+        server = socketserver.ThreadingUnixStreamServer(options.socket, Handler)
+    else:
+        server = socketserver.ThreadingTCPServer(('127.0.0.1', options.port), Handler)
+    server.daemon_threads = True
+    VfrLogger.msg("Listening on {}...\n".format(options.socket or options.port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        worker.close()
+        if options.socket and os.path.exists(options.socket):
+            os.remove(options.socket)
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())